@@ -0,0 +1,61 @@
+import re
+from random import Random
+from time import perf_counter
+
+from library.utils.links import LinkFilter, LinkPolicy
+
+# Fuzz and worst-case timing for the link filter. Run from the repository
+# root: python -m benchmarks.links. Timings are reported here; the bound on
+# the worst case is asserted by tests/test_links.py.
+
+LENGTH = 4000           # longest message Discord allows
+FUZZ = 5000
+ALPHABET = "aw.:/()<>!?[]{}@#-_ \t\n1www.http://https://"
+
+LEGACY = re.compile(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))")
+
+link_filter = LinkFilter({1: LinkPolicy(forbid=True)})
+rng = Random(1337)
+
+def pathological(length):
+  yield "http://" + "!" * length
+  yield "www." + "." * length
+  yield "http://x" + "(a" * (length//2)
+  yield ("a." * (length//2)) + "/"
+  yield "https://" + "a." * (length//2)
+  yield " ".join(["www.a.co/"] * (length//10))
+  yield "a" * length
+  yield ("http:// " * (length//8))
+  yield "x" * (length-1) + "/"
+
+def fuzz(count, length):
+  for _ in range(count):
+    yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, length)))
+
+def worst(texts):
+  slowest, slowest_text = 0.0, ""
+
+  for text in texts:
+    start = perf_counter()
+    link_filter.blocked(1, text)
+    elapsed = perf_counter() - start
+
+    if elapsed > slowest:
+      slowest, slowest_text = elapsed, text
+
+  return slowest, slowest_text
+
+for label, texts in (("pathological", list(pathological(LENGTH))), ("fuzz", list(fuzz(FUZZ, LENGTH)))):
+  slowest, text = worst(texts)
+  print(f"{label:<13} {len(texts):>5,} inputs | worst {slowest*1e6:>8,.1f} us ({text[:24]!r}...)")
+
+print("legacy regex on 'http://' + '!' * n:")
+
+for n in (16, 18, 20, 22):
+  start = perf_counter()
+  LEGACY.search("http://" + "!" * n)
+  legacy = perf_counter() - start
+
+  start = perf_counter()
+  link_filter.blocked(1, "http://" + "!" * n)
+  print(f"  n={n:<3} legacy {legacy*1e6:>10,.1f} us | filter {(perf_counter()-start)*1e6:>6,.1f} us")
@@ -0,0 +1,59 @@
+from random import Random
+from string import ascii_lowercase
+from sys import argv
+from time import perf_counter
+
+from library.utils.profanity import ProfanityFilter
+
+# Compares the Aho-Corasick filter with better_profanity on synthetic word
+# lists. Run from the repository root: python -m benchmarks.profanity [sizes...]
+
+SIZES = [int(size) for size in argv[1:]] or [100, 10_000, 100_000]
+MESSAGES = 2_000
+BASELINE_MESSAGES = 50   # better_profanity needs ~1 s/msg at 100k words
+
+rng = Random(42)
+
+def word():
+  return "".join(rng.choice(ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+def messages(words):
+  chat = [word() for _ in range(500)]
+  sample = list(words)
+
+  for idx in range(MESSAGES):
+    text = [rng.choice(chat) for _ in range(rng.randint(3, 30))]
+
+    if idx % 10 == 0:
+      text.insert(rng.randrange(len(text)), rng.choice(sample))
+
+    yield " ".join(text)
+
+def timed(label, build, check, texts):
+  start = perf_counter()
+  matcher = build()
+  built = perf_counter()
+  hits = sum(1 for text in texts if check(matcher, text))
+  done = perf_counter()
+
+  print(f"  {label:<16} build {(built-start)*1000:>10,.1f} ms | "
+        f"scan {(done-built)/len(texts)*1e6:>9,.1f} us/msg | {hits:,} hits")
+
+def better_profanity(words):
+  from better_profanity import Profanity
+
+  return Profanity(list(words))
+
+for size in SIZES:
+  words = {word() for _ in range(size)}
+  texts = list(messages(words))
+  print(f"{len(words):,} words, {len(texts):,} messages")
+
+  timed("aho-corasick", lambda: ProfanityFilter(words), ProfanityFilter.contains_profanity, texts)
+
+  try:
+    timed("better_profanity", lambda: better_profanity(words), lambda p, t: p.contains_profanity(t),
+          texts[:BASELINE_MESSAGES])
+
+  except ImportError:
+    print("  better_profanity not installed, skipped")
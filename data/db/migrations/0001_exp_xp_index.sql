@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS exp_xp ON exp (XP DESC, UserID);
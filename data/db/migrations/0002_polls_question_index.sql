@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS polls_question ON polls (Question);
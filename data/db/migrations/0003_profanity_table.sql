@@ -0,0 +1,3 @@
+CREATE TABLE IF NOT EXISTS profanity (
+	Word text PRIMARY KEY
+);
@@ -0,0 +1,22 @@
+CREATE TABLE IF NOT EXISTS infractions (
+	InfractionID integer PRIMARY KEY,
+	UserID integer NOT NULL,
+	ModeratorID integer,
+	Action text NOT NULL,
+	Reason text,
+	Duration integer, -- minutes, timed mutes only
+	CreatedAt text NOT NULL -- UTC, "YYYY-MM-DD HH:MM:SS"
+);
+
+CREATE INDEX IF NOT EXISTS infractions_user ON infractions (UserID, CreatedAt);
+CREATE INDEX IF NOT EXISTS infractions_moderator ON infractions (ModeratorID, Action);
+
+CREATE TRIGGER IF NOT EXISTS infractions_no_update BEFORE UPDATE ON infractions
+BEGIN
+	SELECT RAISE(ABORT, 'infractions are append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS infractions_no_delete BEFORE DELETE ON infractions
+BEGIN
+	SELECT RAISE(ABORT, 'infractions are append-only');
+END;
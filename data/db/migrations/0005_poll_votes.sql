@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS poll_votes (
+	MessageID integer,
+	AnswerID integer,
+	UserID integer,
+	PRIMARY KEY (MessageID, AnswerID, UserID)
+) WITHOUT ROWID;
@@ -0,0 +1 @@
+ALTER TABLE polls ADD COLUMN ExpiresAt text;
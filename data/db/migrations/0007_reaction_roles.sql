@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS reaction_roles (
+	MessageID integer,
+	Emoji text,
+	RoleID integer NOT NULL,
+	GroupName text, -- roles sharing a group replace each other, ungrouped roles toggle
+	PRIMARY KEY (MessageID, Emoji)
+) WITHOUT ROWID;
+
+-- The colour roles that used to be hard-coded in the reactions cog.
+INSERT OR IGNORE INTO reaction_roles (MessageID, Emoji, RoleID, GroupName) VALUES
+	(1310013080876617820, '❤️', 1310015488885264404, 'color'),
+	(1310013080876617820, '💙', 1310015633978822697, 'color'),
+	(1310013080876617820, '💛', 1310015566479757382, 'color'),
+	(1310013080876617820, '💚', 1310015601653321852, 'color'),
+	(1310013080876617820, '💜', 1310015726517489774, 'color'),
+	(1310013080876617820, '🖤', 1310015666048204810, 'color');
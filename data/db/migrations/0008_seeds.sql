@@ -0,0 +1,7 @@
+-- One row per one-off data seed, so a seed is never re-applied just because
+-- its table has since been emptied on purpose.
+CREATE TABLE IF NOT EXISTS seeds (
+	Name text PRIMARY KEY
+);
+
+INSERT OR IGNORE INTO seeds (Name) SELECT 'profanity' WHERE EXISTS (SELECT 1 FROM profanity);
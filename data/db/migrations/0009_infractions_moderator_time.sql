@@ -0,0 +1,3 @@
+-- !modstats pages through a moderator's actions newest first, which needs
+-- CreatedAt in the index; (ModeratorID, Action) still serves the totals.
+CREATE INDEX IF NOT EXISTS infractions_moderator_time ON infractions (ModeratorID, CreatedAt);
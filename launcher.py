@@ -1,5 +1,7 @@
+from sys import argv
+
 from library.bot import bot
 
 VERSION = "0.30.0"
 
-bot.run(VERSION)
\ No newline at end of file
+bot.run(VERSION, profile="--profile-startup" in argv)
\ No newline at end of file
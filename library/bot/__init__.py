@@ -1,7 +1,12 @@
 # from datetime import datetime
 import asyncio
 from glob import glob
+from importlib import import_module
 from datetime import datetime
+from time import perf_counter
+
+# Taken before the third-party imports so the startup metric includes them.
+STARTED = perf_counter()
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -11,29 +16,56 @@ from discord.ext.commands import Bot as BotBase
 from discord.ext.commands import Context, when_mentioned_or
 from discord.ext.commands import (CommandNotFound, CommandOnCooldown, BadArgument, MissingRequiredArgument)
 
-from ..db import db
+from ..db import aio
+from ..db.batch import writer
+from .prefixes import PrefixCache
+from .router import MessageRouter
+from ..utils.digest import LogDigest
 
 INTENTS = Intents.all()
 OWNER_IDS = [410939480397053973]
 COGS = [path.split("/")[-1][:-3] for path in glob("library/cogs/*.py")]
 IGNORE_EXCEPTIONS = (CommandNotFound, BadArgument)
+SYNC_CHUNK = 500
+COG_TIMEOUT = 15.0
+COG_TIMEOUTS = {"reactions": 30.0}
 
 def get_prefix(bot, message):
-  prefix = db.field("SELECT Prefix FROM guilds WHERE GuildID = ?", message.guild.id)
+  prefix = bot.prefixes.get(getattr(message.guild, "id", None), count=False)
 
   return when_mentioned_or(prefix)(bot, message)
 
 class Ready(object):
   def __init__(self):
-    for cog in COGS:
-      setattr(self, cog, False)
+    self._events = {cog: asyncio.Event() for cog in COGS}
+    self.timings = {}
+    self.start()
+
+  def start(self):
+    self._started = perf_counter()
 
   def ready_up(self, cog):
-    setattr(self, cog, True)
-    print(f"{cog} cog ready!")
+    self.timings[cog] = perf_counter() - self._started
+    self._events[cog].set()
+    print(f"{cog} cog ready! ({self.timings[cog]*1000:,.0f} ms)")
 
   def all_ready(self):
-    return all([getattr(self, cog) for cog in COGS])
+    return all(event.is_set() for event in self._events.values())
+
+  async def _wait_for(self, cog):
+    timeout = COG_TIMEOUTS.get(cog, COG_TIMEOUT)
+
+    try:
+      await asyncio.wait_for(self._events[cog].wait(), timeout)
+
+    except asyncio.TimeoutError:
+      print(f"{cog} cog did not report ready within {timeout:,.0f}s, continuing without it.")
+      return cog
+
+  async def wait(self):
+    # Cogs initialise concurrently in their own on_ready listeners; this only
+    # waits on their events, and a cog that never reports cannot hang startup.
+    return [cog for cog in await asyncio.gather(*(self._wait_for(cog) for cog in COGS)) if cog]
 
 class Bot(BotBase):
   def __init__(self):
@@ -41,46 +73,93 @@ class Bot(BotBase):
     self.ready = False
     self.cogs_ready = Ready()
     self.guild = None
+    self.prefixes = PrefixCache()
+    self.router = MessageRouter()
+    self.logs = LogDigest()
+    self._syncing = asyncio.Lock()
     self.scheduler = AsyncIOScheduler()
 
-    db.autosave(self.scheduler)
-
     super().__init__(
       command_prefix=get_prefix,
       owner_ids=OWNER_IDS,
       intents=INTENTS
     )
   
-  async def setup(self):
+  async def setup(self, profile=False):
+      timings = []
+
       for cog in COGS:
+          start = perf_counter()
+          # Importing first splits the module's own import cost from the
+          # extension setup that load_extension runs afterwards.
+          if profile:
+            import_module(f"library.cogs.{cog}")
+          imported = perf_counter()
+
           await self.load_extension(f"library.cogs.{cog}")
+          timings.append((cog, imported-start, perf_counter()-imported))
           print(f"{cog} cog loaded!")
       print("Setup complete!!")
 
-  def update_db(self):
-    db.multi_execute("INSERT OR IGNORE INTO guilds (GuildID) VALUES (?)", 
-                    ((guild.id,) for guild in self.guilds))
-    
-    db.multi_execute("INSERT OR IGNORE INTO exp (UserID) VALUES (?)",
-                     ((member.id,) for member in self.guild.members if not member.bot))
-    
-    to_remove = []
-    stored_members = db.column("SELECT UserID from exp")
+      if profile:
+        self.print_startup_profile(timings)
+
+  def print_startup_profile(self, timings):
+    print(f"Startup profile (core imports: {(self.setup_started-STARTED)*1000:,.1f} ms)")
+    print(f"  {'cog':<12}{'import':>12}{'init':>12}")
+
+    for cog, imported, initialised in sorted(timings, key=lambda t: t[1]+t[2], reverse=True):
+      print(f"  {cog:<12}{imported*1000:>9,.1f} ms{initialised*1000:>9,.1f} ms")
+
+    print(f"  {'total':<12}{sum(t[1] for t in timings)*1000:>9,.1f} ms{sum(t[2] for t in timings)*1000:>9,.1f} ms")
 
-    for _id in stored_members:
-      if not self.guild.get_member(_id):
-        to_remove.append(_id)
+  async def update_db(self):
+    start = perf_counter()
 
-    db.multi_execute("DELETE FROM exp WHERE UserID = ?", 
-                     ((_id,) for _id in to_remove))
+    # Pending join/leave writes must land before the stored set is read.
+    await writer.flush(commit=True)
+    await aio.multi_execute("INSERT OR IGNORE INTO guilds (GuildID) VALUES (?)", 
+                            ((guild.id,) for guild in self.guilds))
+
+    members = {member.id for member in self.guild.members if not member.bot}
+    stored = set(await aio.column("SELECT UserID FROM exp"))
+    added, removed = sorted(members - stored), sorted(stored - members)
+
+    for i in range(0, len(added), SYNC_CHUNK):
+      await aio.multi_execute("INSERT OR IGNORE INTO exp (UserID) VALUES (?)",
+                              ((_id,) for _id in added[i:i+SYNC_CHUNK]))
+
+    for i in range(0, len(removed), SYNC_CHUNK):
+      await aio.multi_execute("DELETE FROM exp WHERE UserID = ?", 
+                              ((_id,) for _id in removed[i:i+SYNC_CHUNK]))
     
-    db.commit()
+    await aio.commit()
+    print(f"Member sync: {len(added):,} added, {len(removed):,} removed "
+          f"({len(members):,} members) in {(perf_counter()-start)*1000:,.1f} ms")
+
+    return added, removed
+
+  async def sync_members(self):
+    if self._syncing.locked():
+      return
+
+    async with self._syncing:
+      added, removed = await self.update_db()
+      exp = self.get_cog("Exp")
+
+      for _id in added:
+        exp.index.update(_id, 0, 0)
+
+      for _id in removed:
+        exp.index.remove(_id)
+        exp.states.pop(_id)
   
-  def run(self, version):
+  def run(self, version, profile=False):
     self.VERSION = version
+    self.setup_started = perf_counter()
 
     print("Running setup ... ...")
-    asyncio.run(self.setup())
+    asyncio.run(self.setup(profile))
 
     with open('./library/bot/token.0', 'r', encoding='utf-8') as token_file:
       self.TOKEN = token_file.read()
@@ -88,7 +167,17 @@ class Bot(BotBase):
     print("Running bot...")
     super().run(self.TOKEN, reconnect=True)
 
+  def maybe_command(self, message):
+    content = message.content
+
+    return (content.startswith(self.prefixes.get(message.guild.id))
+            or content.startswith((f"<@{self.user.id}>", f"<@!{self.user.id}>")))
+
   async def process_commands(self, message):
+    # Skip building a Context for ordinary chatter.
+    if not self.maybe_command(message):
+      return
+
     ctx = await self.get_context(message, cls=Context)
 
     if ctx.command is not None and ctx.guild is not None:
@@ -100,6 +189,9 @@ class Bot(BotBase):
   async def rules_reminder(self):
     await self.stdout.send("Remember to adhere to the rules!")
 
+  async def on_guild_join(self, guild):
+    await self.prefixes.add(guild.id)
+
   async def on_connect(self):
     print("bot connected.")
 
@@ -136,13 +228,18 @@ class Bot(BotBase):
 
   async def on_ready(self):
     if not self.ready:
+      self.cogs_ready.start()
       self.guild = self.get_guild(1280030530250735677) # ONLY FOR Single Server Bot Testing
       self.stdout = self.get_channel(1280030530879885345)
       self.err_channel = self.get_channel(1308474152356810752)
       self.scheduler.add_job(self.rules_reminder, CronTrigger(day_of_week = 0, hour = 12, minute = 0, second = 0)) # Send timed message
       self.scheduler.start()
+      writer.start()
+      self.logs.start(self.get_channel(1305747656320090123))
 
-      self.update_db()
+      await self.update_db()
+      await self.prefixes.load()
+      await self.get_cog("Exp").load_index()
 
       # icon = self.get_user(1267992877615681536).display_avatar
 
@@ -166,18 +263,24 @@ class Bot(BotBase):
       # Send a file
       # await channel.send(file=File("./data/images/profile.png"))
 
-      while not self.cogs_ready.all_ready():
-        await asyncio.sleep(0.5)
+      await self.cogs_ready.wait()
 
       # await self.stdout.send("Now Online!")
       self.ready = True
-      print('bot ready')
+      self.startup_time = perf_counter() - STARTED
+      print(f"bot ready ({self.startup_time:,.2f}s since process start)")
 
       meta = self.get_cog("Meta")
       await meta.set()
       
     else:
       print('bot reconnected')
+      await self.sync_members()
+
+  async def on_resumed(self):
+    if self.ready:
+      print('bot resumed')
+      await self.sync_members()
 
   async def on_message(self, message):
     if not message.author.bot:
@@ -199,12 +302,11 @@ class Bot(BotBase):
           for name, value, inline in fields:
             embed.add_field(name=name, value=value, inline=inline)
 
-          mod = self.get_cog("Mod")
-          await mod.log_channel.send(embed=embed)
+          self.logs.put(embed, priority=True)
           await message.channel.send("Message relayed to moderators.")
 
       else:
-        await self.process_commands(message)
+        await asyncio.gather(self.router.dispatch(message), self.process_commands(message))
 
 bot = Bot()
   
\ No newline at end of file
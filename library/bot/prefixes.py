@@ -0,0 +1,39 @@
+from ..db import aio
+
+DEFAULT_PREFIX = "!"
+
+class PrefixCache(object):
+  def __init__(self):
+    self._prefixes = {}
+    self.hits = 0
+    self.misses = 0
+
+  async def load(self):
+    self._prefixes = dict(await aio.records("SELECT GuildID, Prefix FROM guilds"))
+
+  # Each message is looked up twice, once by maybe_command and once by
+  # get_prefix; only the first lookup counts towards the hit rate.
+  def get(self, guild_id, count=True):
+    if guild_id is None:
+      return DEFAULT_PREFIX
+
+    if (prefix := self._prefixes.get(guild_id)) is None:
+      self.misses += count
+      return DEFAULT_PREFIX
+
+    self.hits += count
+    return prefix
+
+  # Prefix changes are rare and must survive a crash, so they are written
+  # straight through rather than queued behind the write-behind flush.
+  async def add(self, guild_id):
+    if guild_id not in self._prefixes:
+      self._prefixes[guild_id] = DEFAULT_PREFIX
+      await aio.execute("INSERT OR IGNORE INTO guilds (GuildID) VALUES (?)", guild_id)
+      await aio.commit()
+
+  async def set(self, guild_id, prefix):
+    self._prefixes[guild_id] = prefix
+    await aio.execute("INSERT INTO guilds (GuildID, Prefix) VALUES (?, ?) ON CONFLICT (GuildID) DO UPDATE SET Prefix = excluded.Prefix",
+                      guild_id, prefix)
+    await aio.commit()
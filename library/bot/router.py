@@ -0,0 +1,95 @@
+import asyncio
+from collections import defaultdict
+from itertools import chain
+from time import perf_counter
+from traceback import print_exc
+
+class Route(object):
+  __slots__ = ("name", "handler", "predicate", "channels", "guilds", "calls", "errors", "elapsed")
+
+  def __init__(self, name, handler, predicate, channels, guilds):
+    self.name = name
+    self.handler = handler
+    self.predicate = predicate
+    self.channels = channels
+    self.guilds = guilds
+    self.calls = 0
+    self.errors = 0
+    self.elapsed = 0.0
+
+# Cogs register message handlers here instead of adding on_message listeners.
+# Routes are indexed by channel ID and guild ID, so a message is only offered
+# to handlers bound to its channel or guild plus the few global ones, and each
+# route can add a cheap predicate on top.
+
+class MessageRouter(object):
+  def __init__(self):
+    self._channels = defaultdict(list)
+    self._guilds = defaultdict(list)
+    self._global = []
+    self.messages = 0
+
+  @property
+  def routes(self):
+    seen = {}
+
+    for route in chain(self._global, *self._guilds.values(), *self._channels.values()):
+      seen[id(route)] = route
+
+    return list(seen.values())
+
+  def register(self, handler, *, channels=(), guilds=(), predicate=None, name=None):
+    route = Route(name or handler.__qualname__, handler, predicate, tuple(channels), tuple(guilds))
+
+    for channel_id in route.channels:
+      self._channels[channel_id].append(route)
+
+    for guild_id in route.guilds:
+      self._guilds[guild_id].append(route)
+
+    if not route.channels and not route.guilds:
+      self._global.append(route)
+
+    return route
+
+  def unregister(self, route):
+    for table, keys in ((self._channels, route.channels), (self._guilds, route.guilds)):
+      for key in keys:
+        if route in (routes := table.get(key, [])):
+          routes.remove(route)
+
+        if not routes:
+          table.pop(key, None)
+
+    if route in self._global:
+      self._global.remove(route)
+
+  async def _call(self, route, message):
+    route.calls += 1
+    start = perf_counter()
+
+    try:
+      await route.handler(message)
+
+    except Exception:
+      route.errors += 1
+      print(f"Message handler {route.name} raised:")
+      print_exc()
+
+    finally:
+      route.elapsed += perf_counter() - start
+
+  async def dispatch(self, message):
+    self.messages += 1
+    guild_id = getattr(message.guild, "id", None)
+
+    matched = [route for route in chain(self._channels.get(message.channel.id, ()),
+                                        self._guilds.get(guild_id, ()),
+                                        self._global)
+               if route.predicate is None or route.predicate(message)]
+
+    if len(matched) == 1:
+      await self._call(matched[0], message)
+
+    elif matched:
+      await asyncio.gather(*(self._call(route, message) for route in matched))
@@ -1,61 +1,94 @@
+from asyncio import ensure_future, get_running_loop, shield
 from datetime import datetime, timedelta
+from time import monotonic, perf_counter
 from typing import Optional
 from random import randint
 from math import ceil
 
-from discord import Member, Embed
+from discord import Member
 from discord.ext.commands import Cog
-from discord.ext.commands import command
-from discord.ext.menus import MenuPages, ListPageSource
+from discord.ext.commands import command, is_owner
 
-from ..db import db
+from ..db import aio
+from ..db.batch import writer, increment
+from ..utils.cache import LRUCache
+from ..utils.levels import level_for, recalculate
+from ..utils.ranking import XPIndex
 
-class HelpMenu(ListPageSource):
-  def __init__(self, ctx, data):
-    self.ctx = ctx
+class XPState(object):
+  __slots__ = ("xp", "level", "ready_at")
 
-    super().__init__(data, per_page=3)
-  
-  async def write_page(self, menu, fields=[]):
-    offset = (menu.current_page*self.per_page) + 1
-    len_data = len(self.entries)
+  def __init__(self, xp, level, xplock):
+    self.xp = xp
+    self.level = level
+    # XPLock is stored as a UTC timestamp; keep it as a monotonic deadline so
+    # the cooldown check never parses strings.
+    remaining = (datetime.fromisoformat(xplock) - datetime.utcnow()).total_seconds()
+    self.ready_at = monotonic() + max(0, remaining)
 
-    embed = Embed(title="XP Leaderboard",
-                  color=self.ctx.author.color)
-    embed.set_thumbnail(url=self.ctx.guild.icon)
-    embed.set_footer(text=f"{offset:,} - {min(len_data, offset+self.per_page-1):,} of {len_data:,} members.")
+class Exp(Cog):
+  XP_COOLDOWN = 60
+  MAX_STATES = 10000
 
-    for name, value in fields:
-      embed.add_field(name=name, value=value, inline=False)
+  def __init__(self, bot):
+    self.bot = bot
+    self.index = XPIndex()
+    self.states = LRUCache(self.MAX_STATES)
+    self._loading = {}
+    self.route = bot.router.register(self.process_exp, name="exp")
 
-    return embed
-  
-  async def format_page(self, menu, entries):
-    offset = (menu.current_page*self.per_page) + 1
-    fields = []
-    table = ("\n".join(f"{idx+offset}. {self.ctx.bot.guild.get_member(entry[0]).display_name} (XP: {entry[1]} | Level: {entry[2]})"
-            for idx, entry in enumerate(entries)))
+  def cog_unload(self):
+    self.bot.router.unregister(self.route)
 
-    fields.append(("Ranks", table))
+  async def load_index(self):
+    rows = await aio.records("SELECT UserID, XP, Level, XPLock FROM exp ORDER BY XPLock")
 
-    return await self.write_page(menu, fields)
+    self.index.build(row[:3] for row in rows)
+    self.states.clear()
 
-class Exp(Cog):
-  def __init__(self, bot):
-    self.bot = bot
+    # Most recently active members are inserted last, so they survive the LRU bound.
+    for user_id, xp, lvl, xplock in rows[-self.MAX_STATES:]:
+      self.states.put(user_id, XPState(xp, lvl, xplock))
 
-  async def process_exp(self, message):
-    xp, lvl, xplock = db.record("SELECT XP, Level, XPLock FROM exp WHERE UserID = ?", message.author.id)
+  async def _load_state(self, user_id):
+    await writer.sync(("exp", user_id))
+    row = await aio.record("SELECT XP, Level, XPLock FROM exp WHERE UserID = ?", user_id)
 
-    if datetime.utcnow() > datetime.fromisoformat(xplock):
-      await self.add_xp(message, xp, lvl)
+    # Another path may have cached the member while the read was in flight.
+    if (state := self.states.get(user_id)) is None and row is not None:
+      state = XPState(*row)
+      self.states.put(user_id, state)
+
+    return state
+
+  async def get_state(self, user_id):
+    if (state := self.states.get(user_id)) is not None:
+      return state
+
+    # Concurrent misses for one member share a single load, so a slow read
+    # can never replace a state that has already been updated.
+    if (task := self._loading.get(user_id)) is None:
+      task = self._loading[user_id] = ensure_future(self._load_state(user_id))
+      task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+
+    return await shield(task)
+
+  async def process_exp(self, message):
+    if (state := await self.get_state(message.author.id)) is not None and monotonic() >= state.ready_at:
+      await self.add_xp(message, state)
 
-  async def add_xp(self, message, xp, lvl):
+  async def add_xp(self, message, state):
     xp_gain = int(ceil(randint(10, 20)))
-    new_lvl = int(((xp+xp_gain)//42) ** 0.55)
+    lvl, new_lvl = state.level, level_for(state.xp+xp_gain)
 
-    db.execute("UPDATE exp SET XP = XP + ?, Level = ?, XPLock = ? WHERE UserID = ?", 
-               xp_gain, new_lvl, (datetime.utcnow()+timedelta(seconds=60)).isoformat(), message.author.id)
+    state.xp += xp_gain
+    state.level = new_lvl
+    state.ready_at = monotonic() + self.XP_COOLDOWN
+
+    writer.put("UPDATE exp SET XP = XP + ?, Level = ?, XPLock = ? WHERE UserID = ?",
+               xp_gain, new_lvl, (datetime.utcnow()+timedelta(seconds=self.XP_COOLDOWN)).isoformat(), message.author.id,
+               key=("exp", message.author.id), merge=increment)
+    self.index.update(message.author.id, state.xp, new_lvl)
     
     if new_lvl > lvl:
       await self.level_channel.send(f"Congrats {message.author.mention} - you leveled up to {new_lvl:,}!")
@@ -63,10 +96,8 @@ class Exp(Cog):
   @command(name="level", aliases=["lvl"], description="Check a member's level.")
   async def display_level(self, ctx, target: Optional[Member]):
     target = target or ctx.author
-    xp, lvl = db.record("SELECT XP, Level FROM exp WHERE UserID = ?", target.id) or (None, None)
-
-    if lvl is not None:
-      await ctx.send(f"{target.display_name} is level {lvl:,} with {xp:,} XP.")
+    if (state := await self.get_state(target.id)) is not None:
+      await ctx.send(f"{target.display_name} is level {state.level:,} with {state.xp:,} XP.")
     
     else:
       await ctx.send(f"{target.display_name} is not tracked by the experience system.")
@@ -75,31 +106,48 @@ class Exp(Cog):
   async def display_rank(self, ctx, target: Optional[Member]):
     target = target or ctx.author
 
-    ids = db.column("SELECT UserID FROM exp ORDER BY XP DESC")
-    try:
-      await ctx.send(f"{target.display_name} is rank {ids.index(target.id)+1} of {len(ids)}.")
+    if (rank := self.index.rank(target.id)) is not None:
+      await ctx.send(f"{target.display_name} is rank {rank:,} of {len(self.index):,}.")
 
-    except ValueError:
+    else:
       await ctx.send(f"{target.display_name} is not tracked by the experience system.")
 
   @command(name="leaderboard", aliases=["lb"], description="Display the guild's exp leaderboard.")
   async def display_leaderboard(self, ctx):
-    records = db.records("SELECT UserID, XP, Level FROM exp ORDER BY XP DESC")
+    from discord.ext.menus import MenuPages
+    from ..utils.menus import LeaderboardMenu
 
-    menu = MenuPages(source=HelpMenu(ctx, records), delete_message_after=True, timeout=300.0)
+    menu = MenuPages(source=LeaderboardMenu(ctx, len(self.index)), delete_message_after=True, timeout=300.0)
     await menu.start(ctx)
 
+  @command(name="recalclevels", description="Recalculate every member's level from their XP.")
+  @is_owner()
+  async def recalculate_levels(self, ctx):
+    start = perf_counter()
+
+    await writer.flush(commit=True)
+    rows = await aio.records("SELECT UserID, XP, Level FROM exp")
+    changed = await get_running_loop().run_in_executor(None, recalculate, rows)
+
+    # Rows that earned XP since the read keep the level add_xp gave them.
+    await aio.multi_execute("UPDATE exp SET Level = ? WHERE UserID = ? AND XP = ?", changed)
+    await aio.commit()
+
+    for lvl, user_id, xp in changed:
+      if (state := self.states.get(user_id)) is not None and state.xp == xp:
+        state.level = lvl
+
+      if (entry := self.index.get(user_id)) is not None and entry[0] == xp:
+        self.index.update(user_id, xp, lvl)
+
+    await ctx.send(f"Recalculated {len(rows):,} members: {len(changed):,} changed level "
+                   f"in {(perf_counter()-start)*1000:,.0f} ms.")
+
   @Cog.listener()
   async def on_ready(self):
     if not self.bot.ready:
       self.level_channel = self.bot.get_channel(1313020049107325020)
       self.bot.cogs_ready.ready_up("exp")
 
-  @Cog.listener()
-  async def on_message(self, message):
-    if not message.author.bot:
-      await self.process_exp(message)
-
-
 async def setup(bot):
   await bot.add_cog(Exp(bot))
\ No newline at end of file
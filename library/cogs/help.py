@@ -2,50 +2,10 @@ from typing import Optional
 
 from discord import Embed
 from discord.utils import get
-from discord.ext.menus import MenuPages, ListPageSource
 from discord.ext.commands import Cog
 from discord.ext.commands import command
 
-def syntax(command):
-  cmd_and_aliases = "|".join([str(command), *command.aliases])
-  params = []
-
-  for key, value in command.params.items():
-    if key not in ("self", "ctx"):
-      params.append(f"[{key}]" if "NoneType" in str(value) else f"<{key}>")
-
-  params = " ".join(params)
-
-  return f"```{cmd_and_aliases} {params}```"
-
-class HelpMenu(ListPageSource):
-  def __init__(self, ctx, data):
-    self.ctx = ctx
-
-    super().__init__(data, per_page=3)
-  
-  async def write_page(self, menu, fields=[]):
-    offset = (menu.current_page*self.per_page) + 1
-    len_data = len(self.entries)
-
-    embed = Embed(title="Help",
-                  description="Welcome to the WoWFinder help dialog!",
-                  color=self.ctx.author.color)
-    embed.set_thumbnail(url=self.ctx.guild.me.avatar)
-    embed.set_footer(text=f"{offset:,} - {min(len_data, offset+self.per_page-1):,} of {len_data:,} commands.")
-
-    for name, value in fields:
-      embed.add_field(name=name, value=value, inline=False)
-
-    return embed
-  
-  async def format_page(self, menu, entries):
-    fields = []
-
-    for entry in entries:
-      fields.append((entry.description or "No description", syntax(entry)))
-
-    return await self.write_page(menu, fields)
+from ..utils.syntax import syntax
 
 class Help(Cog):
   def __init__(self, bot):
@@ -62,6 +22,9 @@ class Help(Cog):
   @command(name="help", description="Provides information about commands.")
   async def show_help(self, ctx, cmd: Optional[str]):
     if cmd is None:
+      from discord.ext.menus import MenuPages
+      from ..utils.menus import HelpMenu
+
       menu = MenuPages(source=HelpMenu(ctx, list(self.bot.commands)),
                        delete_message_after=True,
                        timeout=60.0)
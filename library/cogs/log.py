@@ -10,14 +10,13 @@ class Log(Cog):
   @Cog.listener()
   async def on_ready(self):
     if not self.bot.ready:
-      self.log_channel = self.bot.get_channel(1305747656320090123)
       self.bot.cogs_ready.ready_up("log")
 
   @Cog.listener()
   async def on_user_update(self, before, after):
     if before.name != after.name:
       embed = Embed(title="Name change",
-                    color=self.log_channel.guild.get_member(after.id).color,
+                    color=self.bot.guild.get_member(after.id).color,
                     timestamp=datetime.utcnow())
       
       fields = [("Before", before.name, False),
@@ -26,22 +25,22 @@ class Log(Cog):
       for name, value, inline in fields:
         embed.add_field(name=name, value=value, inline=inline)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
     
     if before.display_avatar != after.display_avatar:
       embed = Embed(title="Avatar change",
               description="New image is below, old to the right",
-              color=self.log_channel.guild.get_member(after.id).color,
+              color=self.bot.guild.get_member(after.id).color,
               timestamp=datetime.utcnow())
       
       embed.set_thumbnail(url=before.display_avatar)
       embed.set_image(url=after.display_avatar)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
 
     if before.discriminator != after.discriminator:
       embed = Embed(title="Discriminator change",
-                    color=self.log_channel.guild.get_member(after.id).color,
+                    color=self.bot.guild.get_member(after.id).color,
                     timestamp=datetime.utcnow())
       
       fields = [("Before", before.discriminator, False),
@@ -50,7 +49,7 @@ class Log(Cog):
       for name, value, inline in fields:
         embed.add_field(name=name, value=value, inline=inline)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
 
   @Cog.listener()
   async def on_member_update(self, before, after):
@@ -65,7 +64,7 @@ class Log(Cog):
       for name, value, inline in fields:
         embed.add_field(name=name, value=value, inline=inline)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
 
     elif before.roles != after.roles:
       embed = Embed(title="Role updates",
@@ -78,7 +77,7 @@ class Log(Cog):
       for name, value, inline in fields:
         embed.add_field(name=name, value=value, inline=inline)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
 
   @Cog.listener()
   async def on_message_edit(self, before, after):
@@ -95,7 +94,7 @@ class Log(Cog):
         for name, value, inline in fields:
           embed.add_field(name=name, value=value, inline=inline)
 
-        await self.log_channel.send(embed=embed)
+        self.bot.logs.put(embed)
 
   @Cog.listener()
   async def on_message_delete(self, message):
@@ -112,7 +111,7 @@ class Log(Cog):
         embed.add_field(name="**Deleted attachment**", value="", inline=False)
         embed.set_image(url=url)
 
-      await self.log_channel.send(embed=embed)
+      self.bot.logs.put(embed)
 
 async def setup(bot):
   await bot.add_cog(Log(bot))
@@ -7,9 +7,9 @@ from discord import Activity, ActivityType, Embed
 from discord import __version__ as discord_version
 from discord.ext.commands import Cog
 from discord.ext.commands import command, has_permissions
-from psutil import Process, virtual_memory
 
-from ..db import db
+from ..db import aio
+from ..db.batch import writer
 
 class Meta(Cog):
   def __init__(self, bot):
@@ -58,6 +58,8 @@ class Meta(Cog):
                   timestamp=datetime.utcnow())
     
     embed.set_thumbnail(url=ctx.guild.me.avatar)
+
+    from psutil import Process, virtual_memory
     
     proc = Process()
     with proc.oneshot():
@@ -74,6 +76,9 @@ class Meta(Cog):
       ("Uptime", f"{uptime}"[0:10], True),
       ("CPU time", f"{cpu_time}"[0:10], True),
       ("Memory usage", f"{mem_usage:,.3f} GB / {mem_total:,.0f} GB ({mem_of_total:.0f}%)", True),
+      ("Startup time", f"{self.bot.startup_time:,.2f}s", True),
+      ("Prefix cache", f"{self.bot.prefixes.hits:,} hits / {self.bot.prefixes.misses:,} misses", True),
+      ("Log digest", f"{self.bot.logs.stats['sent']:,} sent / {self.bot.logs.stats['dropped']:,} dropped", True),
     ]
 
     for name, value, inline in fields:
@@ -81,12 +86,34 @@ class Meta(Cog):
 
     await ctx.send(embed=embed)
 
+  @command(name="routes", description="Show message router fan-out statistics.")
+  @has_permissions(manage_guild=True)
+  async def show_routes(self, ctx):
+    router = self.bot.router
+    routes = sorted(router.routes, key=lambda r: r.calls, reverse=True)
+
+    embed = Embed(title="Message routes",
+                  description=f"{router.messages:,} messages routed, "
+                              f"{sum(r.calls for r in routes)/max(1, router.messages):,.2f} handlers per message.",
+                  color=ctx.author.color,
+                  timestamp=datetime.utcnow())
+
+    for route in routes[:25]:
+      embed.add_field(name=route.name,
+                      value=f"{route.calls:,} calls | {route.errors:,} errors | "
+                            f"{route.elapsed*1000/max(1, route.calls):,.2f} ms avg",
+                      inline=False)
+
+    await ctx.send(embed=embed)
+
   @command(name="shutdown", description="Shutdown the discord bot.")
   async def shutdown(self, ctx):
     await ctx.send("Shutting down...")
 
-    db.commit()
+    await self.bot.logs.close()
+    await writer.close()
     self.bot.scheduler.shutdown()
+    aio.shutdown()
     await self.bot.close()
 
   @Cog.listener()
@@ -2,8 +2,6 @@ from discord.ext.commands import Cog
 from discord.ext.commands import CheckFailure
 from discord.ext.commands import command, has_permissions
 
-from ..db import db
-
 class Misc(Cog):
   def __init__(self, bot):
     self.bot = bot
@@ -15,7 +13,7 @@ class Misc(Cog):
       await ctx.send("The prefix can not be more than 5 characters in length.")
     
     else:
-      db.execute("UPDATE guilds SET Prefix = ? WHERE GuildID = ?", new, ctx.guild.id)
+      await self.bot.prefixes.set(ctx.guild.id, new)
       await ctx.send(f"Prefix set to {new}.")
 
   @change_prefix.error
@@ -1,47 +1,179 @@
 import asyncio
+import re
 from typing import Optional
 from datetime import datetime, timedelta, timezone
-from better_profanity import profanity
-from re import search
 
-from discord import Member, Embed
-from discord.ext.commands import Cog, Greedy
+from discord import Member, User, Embed, Object, HTTPException
+from discord.ext.commands import Cog, Greedy, FlagConverter
 from discord.ext.commands import CheckFailure
 from discord.ext.commands import command, has_permissions, bot_has_permissions
 
-from ..db import db
-
-profanity.load_censor_words_from_file("./data/profanity.txt")
+from ..db import aio
+from ..db.batch import writer
+from ..utils.links import LinkFilter, LinkPolicy
+from ..utils.profanity import ProfanityFilter
+from ..utils.purge import Purge, message_filter
+from ..utils.spam import SpamDetector, Rule, mentions, messages, content, attachments
+from ..utils.timers import ExpiryScheduler
+
+PROFANITY_PATH = "./data/profanity.txt"
+MAX_PURGE = 5000
+ACTION_CONCURRENCY = 5   # member actions in flight during bulk kicks, bans and mutes
+
+SPAM_RULES = [
+  Rule("mentions", 3, 60, mentions, warning="Don't spam mentions!", mute=5),
+  Rule("flood", 8, 10, messages, warning="Slow down, you're sending messages too quickly."),
+  Rule("duplicates", 4, 30, content, same=True, warning="Please don't repeat the same message."),
+  Rule("attachments", 6, 60, attachments, warning="Too many attachments, slow down."),
+]
+
+# EndTime is stored as a naive UTC ISO timestamp.
+def end_timestamp(end_time):
+  return datetime.fromisoformat(end_time).replace(tzinfo=timezone.utc).timestamp()
+
+# !clear 50 --match=discord\.gg --attachments=yes --before=<message id>
+class PurgeFlags(FlagConverter, prefix="--", delimiter="="):
+  match: Optional[str] = None
+  attachments: bool = False
+  before: Optional[int] = None
+  after: Optional[int] = None
+
+class ActionSkipped(Exception):
+  pass
+
+def read_profanity():
+  with open(PROFANITY_PATH, "r", encoding="utf-8") as f:
+    return [w.strip() for w in f.readlines() if w.strip()]
 
 class Mod(Cog):
   def __init__(self, bot):
     self.bot = bot
-
-    self.url_regex = r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
-    self.links_forbidden = (1305735331055669318, 1305735405601165403)
+    self.profanity = None
+    self.profanity_words = set()
+    self._profanity_version = 0
+    self.spam = SpamDetector(SPAM_RULES)
+    self.expirations = ExpiryScheduler(self.expire_mutes)
+    self.route = bot.router.register(self.screen_message, name="mod")
+
+    self.links = LinkFilter({channel_id: LinkPolicy(forbid=True)
+                             for channel_id in (1305735331055669318, 1305735405601165403)})
     self.images_forbidden = (1305735331055669318, 1305735405601165403)
 
+  def cog_unload(self):
+    self.bot.router.unregister(self.route)
+    self.expirations.stop()
+
+  async def load_mutes(self):
+    for user_id, end_time in await aio.records("SELECT UserID, EndTime FROM mutes WHERE EndTime IS NOT NULL"):
+      self.expirations.schedule(user_id, end_timestamp(end_time))
+
+    self.expirations.start()
+
+  async def expire_mutes(self, user_ids):
+    guild = self.bot.guild
+    targets = [m for uid in user_ids if (m := guild.get_member(uid)) is not None and self.mute_role in m.roles]
+    await self.unmute_members(guild, targets)
+
+    # Members who left, or whose role was removed by hand, only need the row cleared.
+    for user_id in set(user_ids) - {t.id for t in targets}:
+      writer.put("DELETE FROM mutes WHERE UserID = ?", user_id, key=("mutes", user_id))
+
+  def action_embed(self, title, target, fields):
+    embed = Embed(title=title,
+                  color=0xDD2222,
+                  timestamp=datetime.utcnow())
+
+    embed.set_thumbnail(url=target.display_avatar)
+
+    for name, value, inline in [("Member", target.display_name, False), *fields]:
+      embed.add_field(name=name, value=value, inline=inline)
+
+    return embed
+
+  async def apply_actions(self, targets, action):
+    # discord.py already waits out per-route rate limit buckets; the semaphore
+    # keeps a large raid cleanup from queueing every request at once.
+    semaphore = asyncio.Semaphore(ACTION_CONCURRENCY)
+
+    async def _apply(target):
+      async with semaphore:
+        try:
+          return target, await action(target), None
+
+        except ActionSkipped as exc:
+          return target, None, f"skipped, {exc}"
+
+        except HTTPException as exc:
+          return target, None, f"failed, {exc.text or exc.status}"
+
+    results = await asyncio.gather(*(_apply(target) for target in dict.fromkeys(targets)))
+
+    # Moderation entries take the log digest's priority lane.
+    for _, embed, _ in results:
+      if embed is not None:
+        self.bot.logs.put(embed, priority=True)
+
+    return [(target, error) for target, _, error in results]
+
+  async def send_report(self, ctx, verb, results):
+    done = sum(error is None for _, error in results)
+    lines = [f"{verb.capitalize()} {done:,} of {len(results):,} member(s)."]
+    lines.extend(f"{target.display_name}: {error or verb}" for target, error in results)
+    report = ""
+
+    # Discord caps messages at 2,000 characters.
+    for line in lines:
+      if len(report) + len(line) + 1 > 2000:
+        await ctx.send(report)
+        report = ""
+
+      report += line + "\n"
+
+    await ctx.send(report)
+
+  def record_infraction(self, action, target, moderator, reason, minutes=None):
+    # Appended through the write-behind queue; rows are never updated or removed.
+    writer.put("INSERT INTO infractions (UserID, ModeratorID, Action, Reason, Duration, CreatedAt) VALUES (?, ?, ?, ?, ?, ?)",
+               target.id, getattr(moderator, "id", None), action, reason, minutes,
+               datetime.utcnow().isoformat(" ", "seconds"))
+
+  async def load_profanity(self):
+    if await aio.field("SELECT Name FROM seeds WHERE Name = 'profanity'") is None:
+      # First run on this database: seed the table from the legacy word list,
+      # once. An emptied table afterwards is a moderator's choice.
+      words = await asyncio.get_running_loop().run_in_executor(None, read_profanity)
+      await aio.multi_execute("INSERT OR IGNORE INTO profanity (Word) VALUES (?)", ((w,) for w in words))
+      await aio.execute("INSERT INTO seeds (Name) VALUES ('profanity')")
+      await aio.commit()
+
+    words = await aio.column("SELECT Word FROM profanity")
+
+    self.profanity_words = set(words)
+    await self.rebuild_profanity()
+
+  async def rebuild_profanity(self):
+    self._profanity_version += 1
+    version = self._profanity_version
+    matcher = await asyncio.get_running_loop().run_in_executor(None, ProfanityFilter, frozenset(self.profanity_words))
+
+    # Only the newest build is swapped in if several edits overlap.
+    if version == self._profanity_version:
+      self.profanity = matcher
+
   async def kick_members(self, message, targets, reason):
-    for target in targets:
-      if (message.guild.me.top_role.position > target.top_role.position
-          and not target.guild_permissions.administrator):
-        await target.kick(reason=reason)
-
-        embed = Embed(title="Member kicked",
-                      color=0xDD2222,
-                      timestamp=datetime.utcnow())
-        
-        embed.set_thumbnail(url=target.display_avatar)
-        
-        fields = [("Member", target.display_name, False),
-                  ("Actioned by", message.author.display_name, False),
-                  ("Reason", reason, False)]
-        
-        for name, value, inline in fields:
-          embed.add_field(name=name, value=value, inline=inline)
-
-        await self.log_channel.send(embed=embed)
+    async def kick(target):
+      if (message.guild.me.top_role.position <= target.top_role.position
+          or target.guild_permissions.administrator):
+        raise ActionSkipped("they outrank the bot")
+
+      await target.kick(reason=reason)
+      self.record_infraction("kick", target, message.author, reason)
 
+      return self.action_embed("Member kicked", target,
+                               [("Actioned by", message.author.display_name, False),
+                                ("Reason", reason, False)])
+
+    return await self.apply_actions(targets, kick)
 
   @command(name="kick", description="Kick members out of the server.")
   @has_permissions(kick_members=True)
@@ -51,8 +183,8 @@ class Mod(Cog):
       await ctx.send("One or more required arguments are missing.")
 
     else:
-      await self.kick_members(ctx.message, targets, reason)
-      await ctx.send("Action complete.")
+      results = await self.kick_members(ctx.message, targets, reason)
+      await self.send_report(ctx, "kicked", results)
 
   @kick_command.error
   async def kick_command_error(self, ctx, exc):
@@ -60,25 +192,19 @@ class Mod(Cog):
       await ctx.send("Insufficient permissions to perform that task.")
 
   async def ban_members(self, message, targets, reason):
-     for target in targets:
-        if (message.guild.me.top_role.position > target.top_role.position
-        and not target.guild_permissions.administrator):
-          await target.ban(reason=reason)
-
-          embed = Embed(title="Member banned",
-                        color=0xDD2222,
-                        timestamp=datetime.utcnow())
-          
-          embed.set_thumbnail(url=target.display_avatar)
-          
-          fields = [("Member", target.display_name, False),
-                    ("Actioned by", message.author.display_name, False),
-                    ("Reason", reason, False)]
-          
-          for name, value, inline in fields:
-            embed.add_field(name=name, value=value, inline=inline)
-
-          await self.log_channel.send(embed=embed)
+    async def ban(target):
+      if (message.guild.me.top_role.position <= target.top_role.position
+          or target.guild_permissions.administrator):
+        raise ActionSkipped("they outrank the bot")
+
+      await target.ban(reason=reason)
+      self.record_infraction("ban", target, message.author, reason)
+
+      return self.action_embed("Member banned", target,
+                               [("Actioned by", message.author.display_name, False),
+                                ("Reason", reason, False)])
+
+    return await self.apply_actions(targets, ban)
 
   @command(name="ban", description="Ban members from the server.")
   @has_permissions(ban_members=True)
@@ -88,8 +214,8 @@ class Mod(Cog):
       await ctx.send("One or more required arguments are missing.")
 
     else:
-      await self.ban_members(ctx.message, targets, reason)
-      await ctx.send("Action complete.")
+      results = await self.ban_members(ctx.message, targets, reason)
+      await self.send_report(ctx, "banned", results)
 
   @ban_command.error
   async def ban_command_error(self, ctx, exc):
@@ -99,57 +225,67 @@ class Mod(Cog):
   @command(name="clear", aliases=["purge"], description="Delete 'x' amount of messages in a channel.")
   @has_permissions(manage_messages=True)
   @bot_has_permissions(manage_messages=True)
-  async def clear_messages(self, ctx, targets: Greedy[Member], limit: Optional[int] = 10):
-    def _check(message):
-      return not len(targets) or message.author in targets
-    
-    if 0 < limit <= 500:
-     async with ctx.typing():
-        await ctx.message.delete()
-        deleted = await ctx.channel.purge(limit=limit, check=_check)
-        await ctx.send(f"Deleted {len(deleted):,} messages.", delete_after=5)
+  async def clear_messages(self, ctx, targets: Greedy[Member], limit: Optional[int] = 10, *, flags: PurgeFlags):
+    if not 0 < limit <= MAX_PURGE:
+      return await ctx.send("The limit provided is not within acceptable bounds.")
 
-    else:
-      ctx.send("The limit provided is not within acceptable bounds.")
+    try:
+      check = message_filter(targets, flags.match, flags.attachments)
+
+    except re.error:
+      return await ctx.send("That pattern is not a valid regular expression.")
+
+    await ctx.message.delete()
+    status = await ctx.send(f"Deleting up to {limit:,} messages...")
+
+    async def report(purge):
+      await status.edit(content=f"Deleted {purge.deleted:,} of {purge.matched:,} matching messages "
+                                f"({purge.scanned:,} scanned)...")
+
+    # The command message bounds the walk so the status message is never swept up.
+    purge = await Purge(ctx.channel, limit, check,
+                        before=Object(id=flags.before) if flags.before else ctx.message,
+                        after=Object(id=flags.after) if flags.after else None,
+                        progress=report).run()
+
+    await status.edit(content=f"Deleted {purge.deleted:,} messages"
+                              + (f" ({purge.failed:,} could not be deleted)." if purge.failed else "."),
+                      delete_after=5)
 
   @clear_messages.error
   async def clear_messages_error(self, ctx, exc):
     if isinstance(exc, CheckFailure):
       await ctx.send("Insufficient permissions to perform that task.")  
 
-  async def mute_members(self, message, targets, minutes, reason):
-    unmutes = []
-    for target in targets:
-      if self.mute_role not in target.roles:
-        if message.guild.me.top_role.position > target.top_role.position:
-          role_ids = ".".join([str(r.id) for r in target.roles])
-          end_time = datetime.utcnow() + timedelta(seconds=minutes*60) if minutes else None
-
-          db.execute("INSERT INTO mutes VALUES (?, ?, ?)",
-                      target.id, role_ids, getattr(end_time, "isoformat", lambda: None)())
-          
-          await target.edit(roles=[self.mute_role])
-
-          embed = Embed(title="Member muted",
-                        color=0xDD2222,
-                        timestamp=datetime.utcnow())
-          
-          embed.set_thumbnail(url=target.display_avatar)
-          
-          fields = [("Member", target.display_name, False),
-                    ("Actioned by", message.author.display_name, False),
-                    ("Duration", f"{minutes:,} minute(s)" if minutes else "Indefinite", False),
-                    ("Reason", reason, False)]
-          
-          for name, value, inline in fields:
-            embed.add_field(name=name, value=value, inline=inline)
-
-          await self.log_channel.send(embed=embed)
-
-          if minutes:
-            unmutes.append(target)
-
-    return unmutes
+  async def mute_members(self, message, targets, minutes, reason, *, moderator=None):
+    moderator = moderator or message.author
+
+    async def mute(target):
+      if self.mute_role in target.roles:
+        raise ActionSkipped("already muted")
+
+      if message.guild.me.top_role.position <= target.top_role.position:
+        raise ActionSkipped("they outrank the bot")
+
+      role_ids = ".".join([str(r.id) for r in target.roles])
+      end_time = datetime.utcnow() + timedelta(seconds=minutes*60) if minutes else None
+
+      await target.edit(roles=[self.mute_role])
+
+      writer.put("INSERT OR REPLACE INTO mutes VALUES (?, ?, ?)",
+                 target.id, role_ids, getattr(end_time, "isoformat", lambda: None)(), key=("mutes", target.id))
+
+      if end_time is not None:
+        self.expirations.schedule(target.id, end_time.replace(tzinfo=timezone.utc).timestamp())
+
+      self.record_infraction("mute", target, moderator, reason, minutes)
+
+      return self.action_embed("Member muted", target,
+                               [("Actioned by", moderator.display_name, False),
+                                ("Duration", f"{minutes:,} minute(s)" if minutes else "Indefinite", False),
+                                ("Reason", reason, False)])
+
+    return await self.apply_actions(targets, mute)
 
   @command(name="mute", description="Mute a member.")
   @has_permissions(manage_guild=True, manage_roles=True)
@@ -160,41 +296,40 @@ class Mod(Cog):
       await ctx.send("One or more required arguments are missing.")
 
     else:
-      unmutes = await self.mute_members(ctx.message, targets, minutes, reason)
-      await ctx.send("Action complete.")
-
-      if len(unmutes):
-        await asyncio.sleep(minutes*60)
-        await self.unmute_members(ctx.message.guild, targets)
+      results = await self.mute_members(ctx.message, targets, minutes, reason)
+      await self.send_report(ctx, "muted", results)
 
   @mute_command.error
   async def mute_command_error(self, ctx, exc):
     if isinstance(exc, CheckFailure):
       await ctx.send("Insufficient permissions to perform that task.")  
 
-  async def unmute_members(self, guild, targets, *, reason = "Mute time expired."):
-    for target in targets:
-      if self.mute_role in target.roles:
-        role_ids = db.field("SELECT RoleIDs FROM mutes WHERE UserID = ?", target.id)
-        roles = [guild.get_role(int(id_)) for id_ in role_ids.split(".") if len(id_)]
+  async def unmute_members(self, guild, targets, *, reason = "Mute time expired.", moderator=None):
+    moderator = moderator or guild.me
+
+    async def unmute(target):
+      self.expirations.cancel(target.id)
+
+      if self.mute_role not in target.roles:
+        raise ActionSkipped("not muted")
+
+      await writer.sync(("mutes", target.id))
+      role_ids = await aio.field("SELECT RoleIDs FROM mutes WHERE UserID = ?", target.id)
 
-        db.execute("DELETE FROM mutes WHERE UserID = ?", target.id)
+      if role_ids is None:
+        # Nothing to restore: only take the mute role away, never the rest.
+        await target.remove_roles(self.mute_role, reason=reason)
 
+      else:
+        roles = [role for id_ in role_ids.split(".") if len(id_) and (role := guild.get_role(int(id_))) is not None]
         await target.edit(roles=roles)
 
-        embed = Embed(title="Member unmuted",
-                        color=0xDD2222,
-                        timestamp=datetime.utcnow())
-          
-        embed.set_thumbnail(url=target.display_avatar)
-          
-        fields = [("Member", target.display_name, False),
-                  ("Reason", reason, False)]
-          
-        for name, value, inline in fields:
-          embed.add_field(name=name, value=value, inline=inline)
+      writer.put("DELETE FROM mutes WHERE UserID = ?", target.id, key=("mutes", target.id))
+      self.record_infraction("unmute", target, moderator, reason)
 
-        await self.log_channel.send(embed=embed)
+      return self.action_embed("Member unmuted", target, [("Reason", reason, False)])
+
+    return await self.apply_actions(targets, unmute)
 
   @command(name="unmute", description="Unmute a member.")
   @has_permissions(manage_guild=True, manage_roles=True)
@@ -204,21 +339,70 @@ class Mod(Cog):
       await ctx.send("One or more required arguments is missing.")
 
     else:
-      await self.unmute_members(ctx.guild, targets, reason=reason)
-      await ctx.send("Action complete.")
+      results = await self.unmute_members(ctx.guild, targets, reason=reason, moderator=ctx.author)
+      await self.send_report(ctx, "unmuted", results)
 
   @unmute_command.error
   async def unmute_members_error(self, ctx, exc):
     if isinstance(exc, CheckFailure):
       await ctx.send("Insufficient permissions to perform that task.")  
 
+  @command(name="infractions", aliases=["warns"], description="Show a member's moderation history.")
+  @has_permissions(kick_members=True)
+  async def show_infractions(self, ctx, target: User):
+    from discord.ext.menus import MenuPages
+    from ..utils.menus import InfractionsMenu
+
+    await writer.flush(commit=True)
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat(" ", "seconds")
+    total = await aio.field("SELECT COUNT(*) FROM infractions WHERE UserID = ?", target.id)
+    recent = await aio.records("SELECT Action, COUNT(*) FROM infractions WHERE UserID = ? AND CreatedAt >= ? "
+                               "GROUP BY Action", target.id, since)
+
+    if not total:
+      await ctx.send(f"{target.display_name} has no infractions.")
+
+    else:
+      menu = MenuPages(source=InfractionsMenu(ctx, target, total, dict(recent)), delete_message_after=True, timeout=300.0)
+      await menu.start(ctx)
+
+  @show_infractions.error
+  async def show_infractions_error(self, ctx, exc):
+    if isinstance(exc, CheckFailure):
+      await ctx.send("Insufficient permissions to perform that task.")
+
+  @command(name="modstats", description="Show how many actions a moderator has taken.")
+  @has_permissions(kick_members=True)
+  async def show_modstats(self, ctx, target: Optional[Member]):
+    from discord.ext.menus import MenuPages
+    from ..utils.menus import ModStatsMenu
+
+    target = target or ctx.author
+
+    await writer.flush(commit=True)
+    counts = await aio.records("SELECT Action, COUNT(*) FROM infractions WHERE ModeratorID = ? "
+                               "GROUP BY Action", target.id)
+
+    if not (total := sum(n for _, n in counts)):
+      await ctx.send(f"{target.display_name} has not taken any moderation actions.")
+
+    else:
+      menu = MenuPages(source=ModStatsMenu(ctx, target, total, dict(counts)), delete_message_after=True, timeout=300.0)
+      await menu.start(ctx)
+
+  @show_modstats.error
+  async def show_modstats_error(self, ctx, exc):
+    if isinstance(exc, CheckFailure):
+      await ctx.send("Insufficient permissions to perform that task.")
+
   @command(name="addprofanity", aliases=["ap"], description="Add terms to the profanity filter.")
   @has_permissions(manage_guild=True)
   async def add_profanity(self, ctx, *words):
-    with open("./data/profanity.txt", "a", encoding="utf-8") as f:
-      f.write("\n".join([f"{w}\n" for w in words]))
+    for word in words:
+      self.profanity_words.add(word)
+      writer.put("INSERT OR IGNORE INTO profanity (Word) VALUES (?)", word, key=("profanity", word))
 
-    profanity.load_censor_words_from_file("./data/profanity.txt")
+    await self.rebuild_profanity()
     await ctx.send("Action complete.")
 
   @add_profanity.error
@@ -229,13 +413,11 @@ class Mod(Cog):
   @command(name="delprofanity", aliases=["dp"], description="Remove terms from the profanity filter.")
   @has_permissions(manage_guild=True)
   async def remove_profanity(self, ctx, *words):
-    with open("./data/profanity.txt", "r", encoding="utf-8") as f:
-      stored = [w.strip() for w in f.readlines()]
+    for word in words:
+      self.profanity_words.discard(word)
+      writer.put("DELETE FROM profanity WHERE Word = ?", word, key=("profanity", word))
 
-    with open("./data/profanity.txt", "w", encoding="utf-8") as f:
-      f.write("".join([f"{w}\n" for w in stored if w not in words]))
-
-    profanity.load_censor_words_from_file("./data/profanity.txt")
+    await self.rebuild_profanity()
     await ctx.send("Action complete.")
 
   @remove_profanity.error
@@ -246,33 +428,31 @@ class Mod(Cog):
   @Cog.listener()
   async def on_ready(self):
     if not self.bot.ready:
-      self.log_channel = self.bot.get_channel(1305747656320090123)
       self.mute_role = self.bot.guild.get_role(1307645692323430420)
       self.profanity_aliases = ["!addprofanity", "!ap", "!delprofanity", "!dp"]
+      # The word list is loaded after the gateway connects, off the event loop.
+      await self.load_profanity()
+      await self.load_mutes()
       self.bot.cogs_ready.ready_up("mod")
 
-  @Cog.listener()
-  async def on_message(self, message):
-    def _check(m):
-      return(m.author == message.author
-             and len(m.mentions)
-             and (datetime.now(timezone.utc)-m.created_at).seconds < 60)
-    
+  async def screen_message(self, message):
     if not message.author.bot:
-      if len(list(filter(lambda m: _check(m), self.bot.cached_messages))) >= 3:
-          await message.channel.send("Don't spam mentions!", delete_after=10)
-          unmutes = await self.mute_members(message, [message.author], 5, reason="Mention spam")
+      if (rule := self.spam.check(message)) is not None:
+        await message.channel.send(rule.warning, delete_after=10)
 
-          if len(unmutes):
-            await asyncio.sleep(5)
-            await self.unmute_members(message.guild, [message.author])
+        if rule.mute:
+          await self.mute_members(message, [message.author], rule.mute, reason=f"Spam ({rule.name})",
+                                  moderator=message.guild.me)
+
+        else:
+          await message.delete()
 
-      elif profanity.contains_profanity(message.content):
+      elif self.profanity is not None and self.profanity.contains_profanity(message.content):
         if not any(cmd in message.content[0:13] for cmd in self.profanity_aliases):
           await message.delete()
           await message.channel.send("That word is not allowed here.", delete_after=10)
 
-      elif message.channel.id in self.links_forbidden and search(self.url_regex, message.content):
+      elif self.links.blocked(message.channel.id, message.content):
         await message.delete()
         await message.channel.send("You can't send links in this channel.", delete_after=10)
 
@@ -1,10 +1,19 @@
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from traceback import print_exc, print_exception
 
-from discord import Embed, Poll
-from discord.ext.commands import Cog
+from discord import Embed, Poll, Role, TextChannel, HTTPException, NotFound
+from discord.ext.commands import Cog, CheckFailure
 from discord.ext.commands import command, has_permissions
 
-from ..db import db
+from ..db import aio
+from ..db.batch import writer
+from ..utils.polls import PollEntry, PollRegistry, dump_expiry, load_expiry
+from ..utils.reactroles import ReactionRoles
+from ..utils.starboard import Starboard
+
+RECOVERY_CONCURRENCY = 5
 
 numbers = ("1️⃣", "2⃣", "3⃣", "4⃣", "5⃣",
 		   "6⃣", "7⃣", "8⃣", "9⃣", "🔟")
@@ -12,145 +21,246 @@ numbers = ("1️⃣", "2⃣", "3⃣", "4⃣", "5⃣",
 class Reactions(Cog):
   def __init__(self, bot):
     self.bot = bot
-    self.polls = db.fetch_polls()
+    self.polls = PollRegistry()
+    self.reaction_roles = ReactionRoles()
 
   @Cog.listener()
   async def on_ready(self):
     if not self.bot.ready:
-      self.colors = {
-        "❤️": self.bot.guild.get_role(1310015488885264404),
-        "💙": self.bot.guild.get_role(1310015633978822697),
-        "💛": self.bot.guild.get_role(1310015566479757382),
-        "💚": self.bot.guild.get_role(1310015601653321852),
-        "💜": self.bot.guild.get_role(1310015726517489774),
-        "🖤": self.bot.guild.get_role(1310015666048204810),
-      }
-      self.reaction_message = await self.bot.get_channel(1310012816979263659).fetch_message(1310013080876617820)
+      polls, votes = await aio.fetch_polls()
+
+      for message_id, channel_id, question, expires_at in polls:
+        self.polls.add(PollEntry(message_id, channel_id, question, load_expiry(expires_at)))
+
+      for message_id, answer_id, user_id in votes:
+        self.polls.vote(message_id, answer_id, user_id)
+
+      self.reaction_roles.load(await aio.records("SELECT MessageID, Emoji, RoleID, GroupName FROM reaction_roles"))
       self.starboard_channel = self.bot.get_channel(1310032208173469756)
+      self.starboard = Starboard(self.bot, self.starboard_channel)
       self.bot.cogs_ready.ready_up("reactions")
 
-      inactive_polls = []
+      await self.recover_polls()
+
+  async def recover_polls(self):
+    now = datetime.now(timezone.utc)
+    # Polls past their stored expiry are closed without touching the API.
+    expired = [entry.message_id for entry in self.polls if entry.expired(now)]
+    semaphore = asyncio.Semaphore(RECOVERY_CONCURRENCY)
+
+    async def recover(entry):
+      async with semaphore:
+        try:
+          if (channel := self.bot.get_channel(entry.channel_id)) is None:
+            return entry.message_id
+
+          message = await channel.fetch_message(entry.message_id)
+
+        except NotFound:
+          return entry.message_id
+
+        except HTTPException:
+          # Leave the poll in place; votes still arrive through gateway events.
+          print_exc()
+          return None
+
+        if message.poll is None or message.poll.is_finalized():
+          return entry.message_id
+
+        entry.answers = {answer.id: answer.text for answer in message.poll.answers}
+
+        if entry.expires_at is None:
+          entry.expires_at = message.poll.expires_at
+          writer.put("UPDATE polls SET ExpiresAt = ? WHERE MessageID = ?",
+                     dump_expiry(entry.expires_at), entry.message_id, key=("polls", entry.message_id))
+
+        for answer in message.poll.answers:
+          # Only answers whose count drifted while the bot was offline are re-read.
+          if answer.vote_count != len(entry.votes.get(answer.id, ())):
+            self.sync_votes(entry, answer.id, {user.id async for user in answer.voters()})
+
+        self.bot.scheduler.add_job(self.poll_ended, "date", run_date=entry.expires_at,
+                                  args=[entry.message_id])
 
-      if len(self.polls) > 0:
-        for question, ids in self.polls.items():
-          channel = self.bot.get_channel(ids[1])
-          message = await channel.fetch_message(ids[0])
+    results = await asyncio.gather(*(recover(entry) for entry in self.polls if not entry.expired(now)),
+                                   return_exceptions=True)
 
-          if message.poll.is_finalized():
-            inactive_polls.append(question)
-          else:
-            self.bot.scheduler.add_job(self.poll_ended, "date", run_date=message.poll.expires_at,
-                                      args=[question])
+    for result in results:
+      if isinstance(result, Exception):
+        print_exception(result)
 
-        for question in inactive_polls:
-          del self.polls[question]
-          db.execute("DELETE FROM polls WHERE Question = ?", question)
+    await self.close_polls(expired + [result for result in results if isinstance(result, int)])
+
+  def sync_votes(self, entry, answer_id, voters):
+    stored = entry.votes.get(answer_id, set())
+
+    for user_id in voters - stored:
+      self.record_vote(entry.message_id, answer_id, user_id)
+
+    for user_id in stored - voters:
+      self.forget_vote(entry.message_id, answer_id, user_id)
+
+  def record_vote(self, message_id, answer_id, user_id):
+    if self.polls.vote(message_id, answer_id, user_id):
+      writer.put("INSERT OR IGNORE INTO poll_votes (MessageID, AnswerID, UserID) VALUES (?, ?, ?)",
+                 message_id, answer_id, user_id, key=("poll_votes", message_id, answer_id, user_id))
+
+  def forget_vote(self, message_id, answer_id, user_id):
+    if self.polls.unvote(message_id, answer_id, user_id):
+      writer.put("DELETE FROM poll_votes WHERE MessageID = ? AND AnswerID = ? AND UserID = ?",
+                 message_id, answer_id, user_id, key=("poll_votes", message_id, answer_id, user_id))
+
+  async def close_polls(self, message_ids):
+    for message_id in message_ids:
+      self.polls.remove(message_id)
+
+    # Votes are keyed per voter, so flush the ones already queued before the
+    # per-poll deletes; a closed poll takes no new votes after this point.
+    await writer.flush()
+
+    for message_id in message_ids:
+      writer.put("DELETE FROM polls WHERE MessageID = ?", message_id, key=("polls", message_id))
+      writer.put("DELETE FROM poll_votes WHERE MessageID = ?", message_id, key=("poll_votes", message_id))
 
   @command(name="createpoll", aliases=["mkpoll"], description="Create a new poll.")
   @has_permissions(manage_guild=True)
   async def create_poll(self, ctx, question: str, hours: int, multiple: str, *answers):
-      if question.lower() in self.polls.keys():
+      if self.polls.find(question) is not None:
         await ctx.send(f"A poll with the question '{question}' already exists.")
 
-      else:
-        if len(answers) > 10:
-          await ctx.send("The amount of answers exceeded the limit of 10, please try again with fewer answers.")
+      elif len(answers) > 10:
+        await ctx.send("The amount of answers exceeded the limit of 10, please try again with fewer answers.")
 
-        poll = Poll(question, timedelta(hours=hours), multiple=(multiple.title()))
+      else:
+        poll = Poll(question, timedelta(hours=hours), multiple=multiple.lower() in ("true", "yes", "y"))
 
         for idx, ans in enumerate(answers):
           poll.add_answer(text=ans, emoji=numbers[idx])
 
-        await ctx.send(poll=poll)
-
-        channel_id = poll.message.channel.id
-        message_id = poll.message.id
+        message = await ctx.send(poll=poll)
+        entry = self.polls.add(PollEntry(message.id, message.channel.id, question, message.poll.expires_at,
+                                         {answer.id: answer.text for answer in message.poll.answers}))
 
-        self.polls[poll.question.lower()] = (poll.message.id, poll.message.channel.id)
-
-        db.execute("INSERT INTO polls VALUES (?, ?, ?)",
-                  message_id, channel_id, poll.question.lower())
+        writer.put("INSERT INTO polls (MessageID, ChannelID, Question, ExpiresAt) VALUES (?, ?, ?, ?)",
+                   message.id, message.channel.id, entry.question, dump_expiry(entry.expires_at),
+                   key=("polls", message.id))
         
-        self.bot.scheduler.add_job(self.poll_ended, "date", run_date=datetime.now()+timedelta(seconds=hours*3600),
-                                  args=[question.lower()])
+        self.bot.scheduler.add_job(self.poll_ended, "date", run_date=entry.expires_at,
+                                  args=[message.id])
         
-  async def poll_ended(self, question):
-    del self.polls[question]
-    db.execute("DELETE FROM polls WHERE Question = ?", question.lower())
+  async def poll_ended(self, message_id):
+    await self.close_polls([message_id])
 
   @command(name="endpoll", description="End an active poll.")
   @has_permissions(manage_guild=True)
   async def end_poll(self, ctx, question):
-    message_id, channel_id = self.polls[question.lower()] or None
-
-    if channel_id is None or message_id is None:
+    if (entry := self.polls.find(question)) is None:
       await ctx.send("I could not find an active poll with that question.")
     
     else:
-      channel = self.bot.get_channel(channel_id)
-      message = await channel.fetch_message(message_id)
+      channel = self.bot.get_channel(entry.channel_id)
+      message = await channel.fetch_message(entry.message_id)
       await message.poll.end()
-      del self.polls[question.lower()]
-      db.execute("DELETE FROM polls WHERE Question = ?", question.lower())
+      await self.close_polls([entry.message_id])
 
       await ctx.send(f"The *{question}* poll has been ended. The final results will be printed shortly.", delete_after=10)
  
   @command(name="activepolls", description="View all active polls.")
   @has_permissions(manage_guild=True)
   async def active_polls(self, ctx):
-    await ctx.send(self.polls)
+    embed = Embed(title="Active polls",
+                  color=ctx.author.color)
+
+    # Tallies come from the locally tracked votes; no messages are fetched.
+    for entry in list(self.polls)[:25]:
+      tallies = entry.tallies()
+      value = "\n".join(f"{entry.answers.get(answer_id, f'Answer {answer_id}')}: {count:,}"
+                        for answer_id, count in tallies.items())
+      embed.add_field(name=entry.question, value=value or "No votes yet.", inline=False)
+
+    if not len(self.polls):
+      embed.description = "There are no active polls."
+
+    await ctx.send(embed=embed)
+
+  @command(name="addreactionrole", aliases=["arr"], description="Bind an emoji on a message to a role.")
+  @has_permissions(manage_roles=True)
+  async def add_reaction_role(self, ctx, channel: TextChannel, message_id: int, emoji: str, role: Role,
+                              group: Optional[str] = None):
+    if role >= ctx.guild.me.top_role:
+      await ctx.send("That role is above my highest role.")
+
+    else:
+      message = channel.get_partial_message(message_id)
+      await message.add_reaction(emoji)
+
+      self.reaction_roles.bind(message_id, emoji, role.id, group)
+      writer.put("INSERT OR REPLACE INTO reaction_roles (MessageID, Emoji, RoleID, GroupName) VALUES (?, ?, ?, ?)",
+                 message_id, emoji, role.id, group, key=("reaction_roles", message_id, emoji))
+
+      await ctx.send("Action complete.")
+
+  @add_reaction_role.error
+  async def add_reaction_role_error(self, ctx, exc):
+    if isinstance(exc, CheckFailure):
+      await ctx.send("Insufficient permissions to perform that task.")
+
+  @command(name="delreactionrole", aliases=["drr"], description="Remove an emoji's role binding from a message.")
+  @has_permissions(manage_roles=True)
+  async def remove_reaction_role(self, ctx, message_id: int, emoji: str):
+    if self.reaction_roles.unbind(message_id, emoji) is None:
+      await ctx.send("That emoji is not bound to a role on that message.")
+
+    else:
+      writer.put("DELETE FROM reaction_roles WHERE MessageID = ? AND Emoji = ?",
+                 message_id, emoji, key=("reaction_roles", message_id, emoji))
+
+      await ctx.send("Action complete.")
+
+  @remove_reaction_role.error
+  async def remove_reaction_role_error(self, ctx, exc):
+    if isinstance(exc, CheckFailure):
+      await ctx.send("Insufficient permissions to perform that task.")
+
+  @command(name="reactionroles", description="List the reaction role bindings.")
+  @has_permissions(manage_roles=True)
+  async def list_reaction_roles(self, ctx):
+    lines = [f"{message_id} {emoji} → {getattr(ctx.guild.get_role(role_id), 'mention', role_id)}"
+             + (f" ({group})" if group else "")
+             for message_id, emoji, role_id, group in self.reaction_roles.bindings()]
+
+    embed = Embed(title="Reaction roles",
+                  description="\n".join(lines)[:4096] or "No reaction roles are set up.",
+                  color=ctx.author.color)
+
+    await ctx.send(embed=embed)
+
+  @Cog.listener()
+  async def on_raw_poll_vote_add(self, payload):
+    self.record_vote(payload.message_id, payload.answer_id, payload.user_id)
+
+  @Cog.listener()
+  async def on_raw_poll_vote_remove(self, payload):
+    self.forget_vote(payload.message_id, payload.answer_id, payload.user_id)
 
   @Cog.listener()
   async def on_raw_reaction_add(self, payload):
-    if self.bot.ready and payload.message_id == self.reaction_message.id:
-      current_colors = filter(lambda r: r in self.colors.values(), payload.member.roles)
-      await payload.member.remove_roles(*current_colors, reason="Color role reaction")
-      await payload.member.add_roles(self.colors.get(payload.emoji.name), reason="Color role reaction")
-      await self.reaction_message.remove_reaction(payload.emoji, payload.member)
-    
-    elif payload.message_id in (poll[1] for poll in self.polls):
-      message = await self.bot.get_channel(payload.channel_id).fetch_message(payload.message_id)
-
-      for reaction in message.reactions:
-        users = [user async for user in reaction.users()]
-        if (not payload.member.bot
-            and payload.member in users
-            and reaction.emoji != payload.emoji.name):
-          await message.remove_reaction(reaction.emoji, payload.member)
-
-    elif payload.emoji.name == "⭐":
-      message = await self.bot.get_channel(payload.channel_id).fetch_message(payload.message_id)
-
-      if not message.author.bot and payload.member.id != message.author.id:
-        msg_id, stars = db.record("SELECT StarMessageID, Stars FROM starboard WHERE RootMessageID = ?",
-                                  message.id) or (None, 0)
-
-        embed = Embed(title="Starred message",
-                      color=message.author.color,
-                      timestamp=datetime.utcnow())
-        
-        fields = [("Author", message.author.mention, False),
-                  ("Content", message.content or "See attachment", False),
-                  ("Stars", stars + 1, False)]
-        
-        for name, value, inline in fields:
-          embed.add_field(name=name, value=value, inline=inline)
-          
-        if len(message.attachments):
-          embed.set_image(url=message.attachments[0].url)
-
-        if not stars:
-          star_message = await self.starboard_channel.send(embed=embed)
-          db.execute("INSERT INTO starboard (RootMessageID, StarMessageID) VALUES (?, ?)",
-                     message.id, star_message.id)
-        
-        else:
-          star_message = await self.starboard_channel.fetch_message(msg_id) or "Message no longer exists"
-          await star_message.edit(embed=embed)
-          db.execute("UPDATE starboard SET Stars = Stars + 1 WHERE RootMessageID = ?", message.id)
+    if self.bot.ready and payload.message_id in self.reaction_roles:
+      if not payload.member.bot:
+        if (role_id := self.reaction_roles.lookup(payload.message_id, str(payload.emoji))) is not None:
+          self.reaction_roles.select(payload.member, role_id)
 
-      else:
+        # The reaction is taken back either way so the same emoji can be clicked again.
+        message = self.bot.get_channel(payload.channel_id).get_partial_message(payload.message_id)
         await message.remove_reaction(payload.emoji, payload.member)
+    
+    elif self.bot.ready and payload.emoji.name == "⭐":
+      await self.starboard.add(payload)
+
+  @Cog.listener()
+  async def on_raw_reaction_remove(self, payload):
+    if self.bot.ready and payload.emoji.name == "⭐":
+      await self.starboard.remove(payload)
 
 async def setup(bot):
   await bot.add_cog(Reactions(bot))
\ No newline at end of file
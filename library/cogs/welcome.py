@@ -1,7 +1,7 @@
 from discord.ext.commands import Cog
 from discord.errors import Forbidden
 
-from ..db import db
+from ..db.batch import writer
 
 class Welcome(Cog):
   def __init__(self, bot):
@@ -16,7 +16,8 @@ class Welcome(Cog):
   
   @Cog.listener()
   async def on_member_join(self, member):
-    db.execute("INSERT INTO exp (UserID) VALUES (?)", member.id)
+    writer.put("INSERT OR IGNORE INTO exp (UserID) VALUES (?)", member.id, key=("exp", member.id))
+    self.bot.get_cog("Exp").index.update(member.id, 0, 0)
     await self.welcome_channel.send(f"Welcome {member.mention} to **{member.guild.name}**! Head over to <#1280030530879885345> to say hi!")
 
     try:
@@ -29,7 +30,10 @@ class Welcome(Cog):
 
   @Cog.listener()
   async def on_member_remove(self, member):
-    db.execute("DELETE FROM exp WHERE UserID = ?", member.id)
+    writer.put("DELETE FROM exp WHERE UserID = ?", member.id, key=("exp", member.id))
+    exp = self.bot.get_cog("Exp")
+    exp.index.remove(member.id)
+    exp.states.pop(member.id)
     await self.goodbye_channel.send(f"{member.display_name} has left **{member.guild.name}**.")
 
 
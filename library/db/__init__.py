@@ -1,3 +1,4 @@
-from . import db
+from . import db, migrations
 
-db.build()
\ No newline at end of file
+db.build()
+migrations.migrate()
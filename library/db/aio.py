@@ -0,0 +1,127 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from sqlite3 import Error
+from threading import local
+
+from . import db
+from .settings import READERS
+
+# Writes are serialised on a single worker thread that owns every cursor on
+# the shared writer connection. Reads go to a bounded pool of read-only
+# connections, which WAL mode lets run concurrently with the writer.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_readers = ThreadPoolExecutor(max_workers=READERS, thread_name_prefix="db-reader")
+_state = local()
+
+def _cursor():
+  if (cur := getattr(_state, "cursor", None)) is None:
+    cur = _state.cursor = db.cxn.cursor()
+
+  return cur
+
+def _read_cursor():
+  if (cur := getattr(_state, "cursor", None)) is None:
+    _state.cxn = db.open_connection(readonly=True)
+    cur = _state.cursor = _state.cxn.cursor()
+
+  return cur
+
+async def _write(func, *args):
+  return await get_running_loop().run_in_executor(_writer, func, *args)
+
+async def _read(func, *args):
+  return await get_running_loop().run_in_executor(_readers, func, *args)
+
+def _field(command, values):
+  (cur := _read_cursor()).execute(command, values)
+
+  if (fetch := cur.fetchone()) is not None:
+    return fetch[0]
+
+def _record(command, values):
+  (cur := _read_cursor()).execute(command, values)
+
+  return cur.fetchone()
+
+def _records(command, values):
+  (cur := _read_cursor()).execute(command, values)
+
+  return cur.fetchall()
+
+def _column(command, values):
+  (cur := _read_cursor()).execute(command, values)
+
+  return [item[0] for item in cur.fetchall()]
+
+def _execute(command, values):
+  _cursor().execute(command, values)
+
+def _multi_execute(command, valueset):
+  _cursor().executemany(command, valueset)
+
+def _batch_execute(command, valueset):
+  # The batch runs inside a savepoint. If any row fails it is rolled back and
+  # replayed row by row, so only the failing rows are lost and none is applied
+  # twice. Returns the failed rows as (values, error) pairs.
+  cur = _cursor()
+
+  if not db.cxn.in_transaction:
+    cur.execute("BEGIN")
+
+  cur.execute("SAVEPOINT batch")
+
+  try:
+    cur.executemany(command, valueset)
+    return []
+
+  except Error:
+    cur.execute("ROLLBACK TO batch")
+    failed = []
+
+    for values in valueset:
+      try:
+        cur.execute(command, values)
+
+      except Error as exc:
+        failed.append((values, exc))
+
+    return failed
+
+  finally:
+    cur.execute("RELEASE batch")
+
+async def field(command, *values):
+  return await _read(_field, command, tuple(values))
+
+async def record(command, *values):
+  return await _read(_record, command, tuple(values))
+
+async def records(command, *values):
+  return await _read(_records, command, tuple(values))
+
+async def column(command, *values):
+  return await _read(_column, command, tuple(values))
+
+async def execute(command, *values):
+  await _write(_execute, command, tuple(values))
+
+async def multi_execute(command, valueset):
+  # Materialise generators here; they usually walk discord.py caches that
+  # must not be touched from the worker thread.
+  await _write(_multi_execute, command, list(valueset))
+
+async def batch_execute(command, valueset):
+  return await _write(_batch_execute, command, list(valueset))
+
+async def commit():
+  await _write(db.commit)
+
+async def fetch_polls():
+  polls = await records("SELECT MessageID, ChannelID, Question, ExpiresAt FROM polls")
+  votes = await records("SELECT MessageID, AnswerID, UserID FROM poll_votes")
+
+  return polls, votes
+
+def shutdown():
+  _writer.shutdown(wait=True)
+  _readers.shutdown(wait=True)
@@ -0,0 +1,141 @@
+import asyncio
+from sqlite3 import Error
+from time import monotonic
+
+from . import aio
+from .settings import FLUSH_SIZE, FLUSH_INTERVAL, COMMIT_INTERVAL
+
+class WriteBehind(object):
+  def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, commit_interval=COMMIT_INTERVAL):
+    self.flush_size = flush_size
+    self.flush_interval = flush_interval
+    self.commit_interval = commit_interval
+    self.stats = {"queued": 0, "coalesced": 0, "flushed": 0, "commits": 0, "errors": 0}
+
+    # Writes are kept as ordered segments of (command, {key: values}). A write
+    # joins the last segment for its command unless a later segment already
+    # touches the same key, so per-key ordering is preserved across commands.
+    self._segments = []
+    self._tail = {}
+    self._latest = {}
+    self._barrier = 0
+    self._pending = 0
+    self._dirty = False
+    self._last_commit = monotonic()
+    self._lock = asyncio.Lock()
+    self._wake = asyncio.Event()
+    self._task = None
+    self._closing = False
+
+  def __len__(self):
+    return self._pending
+
+  def put(self, command, *values, key=None, merge=None):
+    idx = self._tail.get(command)
+    self.stats["queued"] += 1
+
+    # A keyless write may touch any row, so it acts as a barrier: it only joins
+    # the last segment, and no later write joins a segment before it.
+    if keyless := key is None:
+      key = object()
+      idx = idx if idx == len(self._segments)-1 else None
+
+    if idx is None or idx < self._barrier or self._latest.get(key, -1) > idx:
+      idx = len(self._segments)
+      self._segments.append((command, {}))
+      self._tail[command] = idx
+
+    if keyless:
+      self._barrier = idx
+
+    rows = self._segments[idx][1]
+
+    if key in rows:
+      rows[key] = merge(rows[key], values) if merge else values
+      self.stats["coalesced"] += 1
+
+    else:
+      rows[key] = values
+      self._pending += 1
+
+    self._latest[key] = idx
+
+    if self._pending >= self.flush_size:
+      self._wake.set()
+
+  def pending(self, key):
+    return key in self._latest
+
+  async def sync(self, key):
+    # Readers use their own connections and only see committed rows. The key
+    # may also be in a flush that is still running or has not committed yet,
+    # so wait on the lock and commit whenever anything is uncommitted.
+    if self.pending(key) or self._dirty or self._lock.locked():
+      await self.flush(commit=True)
+
+  async def flush(self, commit=False):
+    async with self._lock:
+      segments, self._segments = self._segments, []
+      self._tail, self._latest, self._barrier, self._pending = {}, {}, 0, 0
+
+      for command, rows in segments:
+        try:
+          failed = await aio.batch_execute(command, rows.values())
+
+        except Error as exc:
+          failed = [(values, exc) for values in rows.values()]
+
+        self.stats["flushed"] += len(rows) - len(failed)
+        self.stats["errors"] += len(failed)
+
+        for values, exc in failed:
+          print(f"Write-behind row failed for {command!r} {values!r}: {exc}")
+
+      self._dirty = self._dirty or bool(segments)
+
+      if self._dirty and (commit or self._commit_due()):
+        await aio.commit()
+        self._dirty = False
+        self._last_commit = monotonic()
+        self.stats["commits"] += 1
+
+  def _commit_due(self):
+    return (self.commit_interval is None
+            or (monotonic()-self._last_commit)*1000 >= self.commit_interval)
+
+  def _timeout(self):
+    if self._dirty and self.commit_interval is not None:
+      remaining = self.commit_interval/1000 - (monotonic()-self._last_commit)
+      return max(0, min(self.flush_interval, remaining))
+
+    return self.flush_interval
+
+  async def _run(self):
+    while not self._closing:
+      try:
+        await asyncio.wait_for(self._wake.wait(), timeout=self._timeout())
+
+      except asyncio.TimeoutError:
+        pass
+
+      self._wake.clear()
+      await self.flush()
+
+  def start(self):
+    if self._task is None:
+      self._closing = False
+      self._task = asyncio.create_task(self._run())
+
+  async def close(self):
+    if self._task is not None:
+      self._closing = True
+      self._wake.set()
+      await self._task
+      self._task = None
+
+    await self.flush(commit=True)
+
+def increment(old, new):
+  return (old[0]+new[0], *new[1:])
+
+writer = WriteBehind()
@@ -3,10 +3,23 @@ from sqlite3 import connect, OperationalError
 
 from apscheduler.triggers.cron import CronTrigger
 
+from . import settings
+
 DB_PATH = "./data/db/database.db"
 BUILD_PATH = "./data/db/build.sql"
 
-cxn = connect(DB_PATH, check_same_thread=False)
+def open_connection(readonly=False):
+  if readonly:
+    conn = connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+  else:
+    conn = connect(DB_PATH, check_same_thread=False)
+
+  for pragma, value in settings.pragmas(readonly):
+    conn.execute(f"PRAGMA {pragma} = {value}")
+
+  return conn
+
+cxn = open_connection()
 cursor = cxn.cursor()
 
 def with_commit(func):
@@ -0,0 +1,59 @@
+from glob import glob
+from os.path import basename
+from time import perf_counter
+
+from . import db
+
+MIGRATIONS_PATH = "./data/db/migrations"
+
+# Migrations are numbered sql files (0001_name.sql, ...) applied in order on
+# startup. PRAGMA user_version records the last one applied to the database.
+
+def available():
+  migrations = []
+
+  for path in glob(f"{MIGRATIONS_PATH}/*.sql"):
+    number, _, name = basename(path)[:-4].partition("_")
+    migrations.append((int(number), name, path))
+
+  return sorted(migrations)
+
+def current_version():
+  return db.field("PRAGMA user_version")
+
+def apply(number, path):
+  with open(path, "r", encoding="utf-8") as script:
+    sql = script.read()
+
+  # executescript commits any open transaction first, so wrapping the file in
+  # an explicit one keeps the schema change and the version bump atomic.
+  try:
+    db.cursor.executescript(f"BEGIN;\n{sql}\n;PRAGMA user_version = {number:d};\nCOMMIT;")
+
+  except Exception:
+    db.cxn.rollback()
+    raise
+
+def migrate():
+  version = current_version()
+  applied = []
+
+  for number, name, path in available():
+    if number > version:
+      start = perf_counter()
+      apply(number, path)
+      applied.append((number, name, perf_counter()-start))
+
+  for number, name, elapsed in applied:
+    print(f"Applied migration {number:04d} ({name}) in {elapsed*1000:,.1f} ms")
+
+  if applied:
+    start = perf_counter()
+    db.execute("ANALYZE")
+    db.commit()
+    print(f"Schema at version {applied[-1][0]}, ANALYZE took {(perf_counter()-start)*1000:,.1f} ms")
+
+  else:
+    print(f"Schema up to date at version {version}")
+
+  return applied
@@ -0,0 +1,37 @@
+from os import environ
+
+# Tuning knobs for the sqlite layer. Every value can be overridden through an
+# OOF_DB_* environment variable so deployments can tune for their own disk.
+
+def _setting(name, default, cast=str):
+  value = environ.get(f"OOF_DB_{name}")
+  return default if value is None else cast(value)
+
+def _optional_int(value):
+  return None if value.lower() in ("", "none") else int(value)
+
+JOURNAL_MODE = _setting("JOURNAL_MODE", "WAL")
+SYNCHRONOUS = _setting("SYNCHRONOUS", "NORMAL")
+CACHE_SIZE = _setting("CACHE_SIZE", -16000, int)           # negative values are KiB
+MMAP_SIZE = _setting("MMAP_SIZE", 64 * 1024 * 1024, int)    # bytes, 0 disables mmap
+TEMP_STORE = _setting("TEMP_STORE", "MEMORY")
+BUSY_TIMEOUT = _setting("BUSY_TIMEOUT", 5000, int)          # ms
+
+READERS = _setting("READERS", 4, int)                       # read-only connections in the pool
+
+FLUSH_SIZE = _setting("FLUSH_SIZE", 200, int)               # pending rows that force an early flush
+FLUSH_INTERVAL = _setting("FLUSH_INTERVAL", 1.0, float)     # seconds between background flushes
+# ms between group commits, None commits on every flush
+COMMIT_INTERVAL = _setting("COMMIT_INTERVAL", 250, _optional_int)
+
+def pragmas(readonly=False):
+  shared = [("synchronous", SYNCHRONOUS),
+            ("cache_size", CACHE_SIZE),
+            ("mmap_size", MMAP_SIZE),
+            ("temp_store", TEMP_STORE),
+            ("busy_timeout", BUSY_TIMEOUT)]
+
+  if readonly:
+    return [*shared, ("query_only", "ON")]
+
+  return [("journal_mode", JOURNAL_MODE), *shared]
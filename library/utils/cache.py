@@ -0,0 +1,36 @@
+from collections import OrderedDict
+
+class LRUCache(object):
+  def __init__(self, maxsize):
+    self.maxsize = maxsize
+    self._data = OrderedDict()
+
+  def __len__(self):
+    return len(self._data)
+
+  def __contains__(self, key):
+    return key in self._data
+
+  def get(self, key, default=None):
+    try:
+      self._data.move_to_end(key)
+      return self._data[key]
+
+    except KeyError:
+      return default
+
+  def put(self, key, value):
+    self._data[key] = value
+    self._data.move_to_end(key)
+
+    if len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+
+  def pop(self, key, default=None):
+    return self._data.pop(key, default)
+
+  def values(self):
+    return self._data.values()
+
+  def clear(self):
+    self._data.clear()
@@ -0,0 +1,123 @@
+import asyncio
+from collections import deque
+from traceback import print_exc
+
+from discord import HTTPException
+
+EMBEDS_PER_MESSAGE = 10
+EMBED_CHARS = 6000     # Discord's limit on the combined size of a message's embeds
+FLUSH_INTERVAL = 2.0
+MAX_ROUTINE = 500
+MAX_PRIORITY = 200
+FIELD_CHARS = 1024     # Discord's limit on a single field value
+
+class LogDigest(object):
+  def __init__(self, channel=None, interval=FLUSH_INTERVAL, max_routine=MAX_ROUTINE, max_priority=MAX_PRIORITY):
+    self.channel = channel
+    self.interval = interval
+    self.stats = {"queued": 0, "sent": 0, "messages": 0, "dropped": 0, "overflowed": 0, "errors": 0}
+
+    # Routine entries (edits, deletions, profile changes) wait for the next
+    # tick and are dropped oldest-first when their lane is full. Moderation
+    # entries use the priority lane: they wake the flusher straight away and
+    # always go out ahead of routine entries.
+    self._priority = deque()
+    self._routine = deque()
+    self._max = {True: max_priority, False: max_routine}
+    self._unreported = 0
+    self._wake = asyncio.Event()
+    self._task = None
+    self._closing = False
+
+  def __len__(self):
+    return len(self._priority) + len(self._routine)
+
+  def put(self, embed, priority=False):
+    lane = self._priority if priority else self._routine
+    self.stats["queued"] += 1
+
+    if len(lane) >= self._max[priority]:
+      lane.popleft()
+      self._unreported += 1
+      self.stats["overflowed" if priority else "dropped"] += 1
+
+    # Message edits and deletions carry raw message text, which can exceed the
+    # field limit and would get the whole batch rejected.
+    for idx, field in enumerate(embed.fields):
+      if field.value is not None and len(field.value) > FIELD_CHARS:
+        embed.set_field_at(idx, name=field.name, value=field.value[:FIELD_CHARS-1] + "…", inline=field.inline)
+
+    lane.append(embed)
+
+    if priority:
+      self._wake.set()
+
+  def _batch(self):
+    embeds, size = [], 0
+
+    for lane in (self._priority, self._routine):
+      while lane and len(embeds) < EMBEDS_PER_MESSAGE and (not embeds or size + len(lane[0]) <= EMBED_CHARS):
+        size += len(lane[0])
+        embeds.append(lane.popleft())
+
+    return embeds
+
+  async def flush(self):
+    while self.channel is not None and (embeds := self._batch()):
+      content = None
+
+      if self._unreported:
+        content = f"{self._unreported:,} log entries were dropped while the log channel was backed up."
+        self._unreported = 0
+
+      try:
+        await self._send(content, embeds)
+
+      except HTTPException as exc:
+        if exc.status >= 500 or len(embeds) == 1:
+          self.stats["errors"] += 1
+          print_exc()
+          continue
+
+        # A rejected batch usually means one invalid embed. Send the rest one
+        # at a time, so it cannot take moderation entries down with it.
+        for embed in embeds:
+          try:
+            await self._send(content, [embed])
+            content = None
+
+          except HTTPException:
+            self.stats["errors"] += 1
+            print_exc()
+
+  async def _send(self, content, embeds):
+    await self.channel.send(content=content, embeds=embeds)
+    self.stats["sent"] += len(embeds)
+    self.stats["messages"] += 1
+
+  async def _run(self):
+    while not self._closing:
+      try:
+        await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+
+      except asyncio.TimeoutError:
+        pass
+
+      self._wake.clear()
+      await self.flush()
+
+  def start(self, channel=None):
+    self.channel = channel or self.channel
+
+    if self._task is None:
+      self._closing = False
+      self._task = asyncio.create_task(self._run())
+
+  async def close(self):
+    if self._task is not None:
+      self._closing = True
+      self._wake.set()
+      await self._task
+      self._task = None
+
+    await self.flush()
@@ -0,0 +1,49 @@
+from bisect import bisect_right
+from math import ceil
+
+XP_PER_STEP = 42
+EXPONENT = 0.55
+MAX_LEVEL = 1000
+
+# Level L is reached once int((XP // XP_PER_STEP) ** EXPONENT) >= L. The curve
+# is precomputed as the minimum XP for every level, so a lookup is a bisect
+# instead of a float power per award.
+
+def _threshold(level):
+  steps = ceil(level ** (1/EXPONENT))
+
+  while steps > 0 and int((steps-1) ** EXPONENT) >= level:
+    steps -= 1
+
+  while int(steps ** EXPONENT) < level:
+    steps += 1
+
+  return steps * XP_PER_STEP
+
+THRESHOLDS = [_threshold(level) for level in range(MAX_LEVEL+1)]
+
+def level_for(xp):
+  if xp >= THRESHOLDS[-1]:
+    return int((xp//XP_PER_STEP) ** EXPONENT)
+
+  return bisect_right(THRESHOLDS, xp) - 1
+
+def recalculate(rows):
+  # Vectorised pass over (UserID, XP, Level) rows; returns (Level, UserID, XP)
+  # for every member whose stored level is stale.
+  import numpy as np
+
+  if not rows:
+    return []
+
+  data = np.array(rows, dtype=np.int64)
+  ids, xp, old = data[:, 0], data[:, 1], data[:, 2]
+
+  new = np.searchsorted(np.array(THRESHOLDS, dtype=np.int64), xp, side="right") - 1
+
+  if (overflow := xp >= THRESHOLDS[-1]).any():
+    new[overflow] = [level_for(int(value)) for value in xp[overflow]]
+
+  changed = np.nonzero(new != old)[0]
+
+  return list(zip(new[changed].tolist(), ids[changed].tolist(), xp[changed].tolist()))
@@ -0,0 +1,102 @@
+from string import ascii_lowercase
+
+MAX_LENGTH = 4000     # characters inspected per message, Discord's own cap
+MAX_TOKEN = 512       # characters inspected per token
+SCHEMES = frozenset(("http", "https", "ftp"))
+HOST_SYMBOLS = frozenset(".-_")
+TRIM = "<>()[]{}\"'`*_|~,;!?"
+
+# Link detection without regular expressions: a substring prefilter rejects
+# most messages outright, then a whitespace tokenizer inspects every token of
+# the first MAX_LENGTH characters, at most MAX_TOKEN characters each. Every
+# step is a single linear scan, so the work grows linearly with the message.
+
+# Zero-width and soft-hyphen characters are removed before tokenizing so they
+# cannot be used to split or hide a domain.
+_INVISIBLE = str.maketrans(dict.fromkeys(map(ord, "\u00ad\u200b\u200c\u200d\u200e\u200f\u2060\ufeff")))
+
+def _host(token):
+  if (idx := token.find("://")) != -1:
+    start = idx
+
+    while start and token[start-1] in ascii_lowercase:
+      start -= 1
+
+    if token[start:idx] not in SCHEMES:
+      return None
+
+    if not (authority := token[idx+3:]):
+      return None
+
+  elif (token.startswith("www") and 3 <= (dot := token.find(".")) <= 6
+        and (dot == 3 or token[3:dot].isdigit())):
+    authority = token[dot+1:]
+
+  elif "/" in token:
+    authority = token
+
+  else:
+    return None
+
+  for sep in "/?#":
+    authority = authority.partition(sep)[0]
+
+  host = authority.rpartition("@")[2].partition(":")[0].rstrip(".")
+  labels = host.split(".")
+
+  if not host or not all(c.isalnum() or c in HOST_SYMBOLS for c in host):
+    # An explicit scheme makes it a link even when the host does not parse.
+    return token if idx != -1 else None
+
+  # Without an explicit scheme the token must look like a real domain name.
+  if idx == -1 and (len(labels) < 2 or not all(labels)
+                    or not 2 <= len(labels[-1]) <= 63 or not labels[-1].isalpha()):
+    return None
+
+  return host
+
+def domains(text):
+  text = text[:MAX_LENGTH].lower().translate(_INVISIBLE)
+
+  if "://" not in text and ("." not in text or ("/" not in text and "www" not in text)):
+    return
+
+  for token in text.split():
+    if ("." in token or "://" in token) and (host := _host(token[:MAX_TOKEN].strip(TRIM))) is not None:
+      yield host
+
+def _suffixes(domain):
+  yield domain
+
+  while (idx := domain.find(".")) != -1:
+    domain = domain[idx+1:]
+    yield domain
+
+class LinkPolicy(object):
+  __slots__ = ("forbid", "allow", "deny")
+
+  def __init__(self, forbid=False, allow=(), deny=()):
+    self.forbid = forbid
+    self.allow = frozenset(d.lower() for d in allow)
+    self.deny = frozenset(d.lower() for d in deny)
+
+  def blocks(self, domain):
+    if any(suffix in self.deny for suffix in _suffixes(domain)):
+      return True
+
+    return self.forbid and not any(suffix in self.allow for suffix in _suffixes(domain))
+
+class LinkFilter(object):
+  def __init__(self, policies=None, default=None):
+    self.policies = dict(policies or {})
+    self.default = default or LinkPolicy()
+
+  def blocked(self, channel_id, text):
+    policy = self.policies.get(channel_id, self.default)
+
+    if not policy.forbid and not policy.deny:
+      return None
+
+    for domain in domains(text):
+      if policy.blocks(domain):
+        return domain
@@ -0,0 +1,234 @@
+from math import ceil
+
+from discord import Embed
+from discord.ext.menus import ListPageSource, PageSource
+
+from ..db import aio
+from .syntax import syntax
+
+# Menu page sources live outside the cogs so discord.ext.menus is only
+# imported the first time a paginated command is used.
+
+class HelpMenu(ListPageSource):
+  def __init__(self, ctx, data):
+    self.ctx = ctx
+
+    super().__init__(data, per_page=3)
+  
+  async def write_page(self, menu, fields=[]):
+    offset = (menu.current_page*self.per_page) + 1
+    len_data = len(self.entries)
+
+    embed = Embed(title="Help",
+                  description="Welcome to the WoWFinder help dialog!",
+                  color=self.ctx.author.color)
+    embed.set_thumbnail(url=self.ctx.guild.me.avatar)
+    embed.set_footer(text=f"{offset:,} - {min(len_data, offset+self.per_page-1):,} of {len_data:,} commands.")
+
+    for name, value in fields:
+      embed.add_field(name=name, value=value, inline=False)
+
+    return embed
+  
+  async def format_page(self, menu, entries):
+    fields = []
+
+    for entry in entries:
+      fields.append((entry.description or "No description", syntax(entry)))
+
+    return await self.write_page(menu, fields)
+
+class KeysetPageSource(PageSource):
+  # Pages are fetched on demand, so an open menu only ever holds the rows of
+  # the page being viewed. Stepping to the next or previous page seeks from
+  # the key of the current page's last or first row, which costs one index
+  # range scan however deep the page is; jumps fall back to OFFSET.
+  # Subclasses supply the queries and the key of a row.
+
+  def __init__(self, ctx, total, per_page):
+    self.ctx = ctx
+    self.total = total
+    self.per_page = per_page
+    self._page, self._first, self._last = None, None, None
+
+  def is_paginating(self):
+    return self.total > self.per_page
+
+  def get_max_pages(self):
+    return max(1, ceil(self.total / self.per_page))
+
+  def key(self, row):
+    raise NotImplementedError
+
+  async def fetch_page(self, offset):
+    raise NotImplementedError
+
+  async def fetch_after(self, key):
+    raise NotImplementedError
+
+  # Returns the rows nearest the key first, so the page comes back reversed.
+  async def fetch_before(self, key):
+    raise NotImplementedError
+
+  async def get_page(self, page_number):
+    if self._page is not None and page_number == self._page+1 and self._last:
+      rows = await self.fetch_after(self._last)
+
+    elif self._page is not None and page_number == self._page-1 and self._first:
+      rows = (await self.fetch_before(self._first))[::-1]
+
+    else:
+      rows = await self.fetch_page(page_number*self.per_page)
+
+    self._page = page_number
+    self._first = self.key(rows[0]) if rows else None
+    self._last = self.key(rows[-1]) if rows else None
+
+    return rows
+
+  def footer(self, menu, noun):
+    offset = (menu.current_page*self.per_page) + 1
+
+    return f"{offset:,} - {min(self.total, offset+self.per_page-1):,} of {self.total:,} {noun}."
+
+class LeaderboardMenu(KeysetPageSource):
+  # Keyset pagination on (XP DESC, UserID).
+  COLUMNS = "SELECT UserID, XP, Level FROM exp"
+
+  def __init__(self, ctx, total, per_page=3):
+    super().__init__(ctx, total, per_page)
+
+  def key(self, row):
+    return row[1], row[0]
+
+  async def fetch_page(self, offset):
+    return await aio.records(f"{self.COLUMNS} ORDER BY XP DESC, UserID LIMIT ? OFFSET ?", self.per_page, offset)
+
+  async def fetch_after(self, key):
+    xp, user_id = key
+
+    return await aio.records(f"{self.COLUMNS} WHERE XP <= ? AND (XP < ? OR UserID > ?) "
+                             "ORDER BY XP DESC, UserID LIMIT ?", xp, xp, user_id, self.per_page)
+
+  async def fetch_before(self, key):
+    xp, user_id = key
+
+    return await aio.records(f"{self.COLUMNS} WHERE XP >= ? AND (XP > ? OR UserID < ?) "
+                             "ORDER BY XP ASC, UserID DESC LIMIT ?", xp, xp, user_id, self.per_page)
+
+  def display_names(self, user_ids):
+    names = {}
+
+    for user_id in user_ids:
+      if (member := self.ctx.guild.get_member(user_id)) is not None:
+        names[user_id] = member.display_name
+      elif (user := self.ctx.bot.get_user(user_id)) is not None:
+        names[user_id] = f"{user.display_name} (left)"
+      else:
+        names[user_id] = "Departed member"
+
+    return names
+
+  async def write_page(self, menu, fields=[]):
+    embed = Embed(title="XP Leaderboard",
+                  color=self.ctx.author.color)
+    embed.set_thumbnail(url=self.ctx.guild.icon)
+    embed.set_footer(text=self.footer(menu, "members"))
+
+    for name, value in fields:
+      embed.add_field(name=name, value=value, inline=False)
+
+    return embed
+  
+  async def format_page(self, menu, entries):
+    offset = (menu.current_page*self.per_page) + 1
+    names = self.display_names([entry[0] for entry in entries])
+    fields = []
+    table = ("\n".join(f"{idx+offset}. {names[entry[0]]} (XP: {entry[1]} | Level: {entry[2]})"
+            for idx, entry in enumerate(entries)))
+
+    fields.append(("Ranks", table or "No members ranked yet."))
+
+    return await self.write_page(menu, fields)
+
+class InfractionPages(KeysetPageSource):
+  # Keyset pagination over a (FILTER, CreatedAt) index, newest first. The
+  # index also carries the rowid, which breaks ties within the same second.
+  COLUMNS = "SELECT InfractionID, Action, UserID, ModeratorID, Reason, Duration, CreatedAt FROM infractions"
+  FILTER = None
+  TITLE = None
+  SUMMARY = None
+  NOUN = None
+
+  def __init__(self, ctx, target, total, counts, per_page=5):
+    self.target = target
+    self.counts = counts
+
+    super().__init__(ctx, total, per_page)
+
+  def key(self, row):
+    return row[6], row[0]
+
+  async def fetch_page(self, offset):
+    return await aio.records(f"{self.COLUMNS} WHERE {self.FILTER} = ? ORDER BY CreatedAt DESC, InfractionID DESC "
+                             "LIMIT ? OFFSET ?", self.target.id, self.per_page, offset)
+
+  async def fetch_after(self, key):
+    return await aio.records(f"{self.COLUMNS} WHERE {self.FILTER} = ? AND (CreatedAt, InfractionID) < (?, ?) "
+                             "ORDER BY CreatedAt DESC, InfractionID DESC LIMIT ?", self.target.id, *key, self.per_page)
+
+  async def fetch_before(self, key):
+    return await aio.records(f"{self.COLUMNS} WHERE {self.FILTER} = ? AND (CreatedAt, InfractionID) > (?, ?) "
+                             "ORDER BY CreatedAt ASC, InfractionID ASC LIMIT ?", self.target.id, *key, self.per_page)
+
+  def member_name(self, user_id, unknown):
+    if (member := self.ctx.guild.get_member(user_id)) is not None:
+      return member.display_name
+
+    return unknown
+
+  async def write_page(self, menu, fields=[]):
+    counts = ", ".join(f"{action}: {count:,}" for action, count in sorted(self.counts.items())) or "None"
+
+    embed = Embed(title=self.TITLE.format(self.target.display_name),
+                  description=f"{self.SUMMARY}: {counts}",
+                  color=self.ctx.author.color)
+    embed.set_thumbnail(url=self.target.display_avatar)
+    embed.set_footer(text=self.footer(menu, self.NOUN))
+
+    for name, value in fields:
+      embed.add_field(name=name, value=value, inline=False)
+
+    return embed
+
+class InfractionsMenu(InfractionPages):
+  FILTER = "UserID"
+  TITLE = "Infractions for {}"
+  SUMMARY = "Last 30 days"
+  NOUN = "infractions"
+
+  async def format_page(self, menu, entries):
+    fields = []
+
+    for infraction_id, action, _, moderator_id, reason, duration, created_at in entries:
+      name = f"#{infraction_id} {action.title()}" + (f" ({duration:,} minute(s))" if duration else "")
+      moderator = self.member_name(moderator_id, "Unknown moderator")
+      fields.append((name, f"{created_at} UTC by {moderator}\n{reason or 'No reason provided.'}"))
+
+    return await self.write_page(menu, fields)
+
+class ModStatsMenu(InfractionPages):
+  FILTER = "ModeratorID"
+  TITLE = "Moderation stats for {}"
+  SUMMARY = "Totals"
+  NOUN = "actions"
+
+  async def format_page(self, menu, entries):
+    fields = []
+
+    for infraction_id, action, user_id, _, reason, duration, created_at in entries:
+      name = f"#{infraction_id} {action.title()}" + (f" ({duration:,} minute(s))" if duration else "")
+      member = self.member_name(user_id, f"<@{user_id}>")
+      fields.append((name, f"{created_at} UTC on {member}\n{reason or 'No reason provided.'}"))
+
+    return await self.write_page(menu, fields)
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+# ExpiresAt is stored as a naive UTC ISO timestamp, like the other tables.
+def dump_expiry(expires_at):
+  return expires_at.astimezone(timezone.utc).replace(tzinfo=None).isoformat() if expires_at else None
+
+def load_expiry(text):
+  return datetime.fromisoformat(text).replace(tzinfo=timezone.utc) if text else None
+
+class PollEntry(object):
+  __slots__ = ("message_id", "channel_id", "question", "expires_at", "answers", "votes")
+
+  def __init__(self, message_id, channel_id, question, expires_at=None, answers=None):
+    self.message_id = message_id
+    self.channel_id = channel_id
+    self.question = question
+    self.expires_at = expires_at
+    self.answers = dict(answers or {})
+    self.votes = {}
+
+  def expired(self, now):
+    return self.expires_at is not None and self.expires_at <= now
+
+  def tallies(self):
+    return {answer_id: len(self.votes.get(answer_id, ())) for answer_id in self.answers or self.votes}
+
+# Active polls indexed by message ID, which is what vote events carry, with a
+# secondary index on the lowercased question for the commands. Votes are kept
+# as per-answer sets of user IDs, so replayed gateway events are idempotent.
+
+class PollRegistry(object):
+  def __init__(self):
+    self._by_message = {}
+    self._by_question = {}
+
+  def __len__(self):
+    return len(self._by_message)
+
+  def __contains__(self, message_id):
+    return message_id in self._by_message
+
+  def __iter__(self):
+    return iter(list(self._by_message.values()))
+
+  def add(self, entry):
+    entry.question = entry.question.lower()
+    self._by_message[entry.message_id] = entry
+    self._by_question[entry.question] = entry
+
+    return entry
+
+  def get(self, message_id):
+    return self._by_message.get(message_id)
+
+  def find(self, question):
+    return self._by_question.get(question.lower())
+
+  def remove(self, message_id):
+    if (entry := self._by_message.pop(message_id, None)) is not None:
+      if self._by_question.get(entry.question) is entry:
+        del self._by_question[entry.question]
+
+    return entry
+
+  def vote(self, message_id, answer_id, user_id):
+    if (entry := self._by_message.get(message_id)) is None:
+      return False
+
+    voters = entry.votes.setdefault(answer_id, set())
+    size = len(voters)
+    voters.add(user_id)
+
+    return len(voters) != size
+
+  def unvote(self, message_id, answer_id, user_id):
+    if (entry := self._by_message.get(message_id)) is None or user_id not in entry.votes.get(answer_id, ()):
+      return False
+
+    entry.votes[answer_id].discard(user_id)
+
+    return True
@@ -0,0 +1,99 @@
+from collections import deque
+from string import punctuation, whitespace
+
+LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s", "+": "t"}
+
+# Text is casefolded, common character substitutions are mapped back to
+# letters, and punctuation and whitespace both act as word breaks, so
+# "hello,ass" and "ass-hat" keep their words apart. Words come back joined by
+# single spaces, and runs of single letters are joined into one word, so
+# "f.u.c.k" and "f u c k" still normalise to their plain spelling.
+_TABLE = str.maketrans({**{c: " " for c in punctuation if c not in LEET},
+                        **{c: " " for c in whitespace},
+                        **LEET})
+
+def normalise(text):
+  words, letters = [], []
+
+  for word in text.casefold().translate(_TABLE).split():
+    if len(word) == 1:
+      letters.append(word)
+      continue
+
+    if letters:
+      words.append("".join(letters))
+      letters = []
+
+    words.append(word)
+
+  if letters:
+    words.append("".join(letters))
+
+  return " ".join(words)
+
+# Aho-Corasick automaton over the normalised word list. A message is scanned
+# once regardless of how many words are loaded, and matches only count when
+# they cover whole words.
+
+class ProfanityFilter(object):
+  def __init__(self, words=()):
+    self.words = frozenset(w for w in (normalise(word).strip() for word in words) if w)
+    self._build()
+
+  def __len__(self):
+    return len(self.words)
+
+  def _build(self):
+    goto, fail, out = [{}], [0], [()]
+
+    for word in self.words:
+      node = 0
+
+      for char in word:
+        if (nxt := goto[node].get(char)) is None:
+          nxt = goto[node][char] = len(goto)
+          goto.append({})
+          fail.append(0)
+          out.append(())
+
+        node = nxt
+
+      out[node] = (*out[node], len(word))
+
+    queue = deque(goto[0].values())
+
+    while queue:
+      node = queue.popleft()
+
+      for char, nxt in goto[node].items():
+        queue.append(nxt)
+        state = fail[node]
+
+        while state and char not in goto[state]:
+          state = fail[state]
+
+        fail[nxt] = goto[state].get(char, 0)
+        out[nxt] = (*out[nxt], *out[fail[nxt]])
+
+    self._goto, self._fail, self._out = goto, fail, out
+
+  def find(self, text):
+    goto, fail, out = self._goto, self._fail, self._out
+    text = normalise(text)
+    node, size = 0, len(text)
+
+    for idx, char in enumerate(text):
+      while node and char not in goto[node]:
+        node = fail[node]
+
+      node = goto[node].get(char, 0)
+
+      for length in out[node]:
+        start, end = idx-length+1, idx+1
+
+        if ((start == 0 or not text[start-1].isalnum())
+            and (end == size or not text[end].isalnum())):
+          return text[start:end]
+
+  def contains_profanity(self, text):
+    return self.find(text) is not None
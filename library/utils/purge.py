@@ -0,0 +1,118 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+
+from discord import HTTPException
+
+BULK_SIZE = 100               # Discord's bulk delete limit
+MAX_AGE = timedelta(days=14)  # bulk delete only accepts messages younger than this
+MAX_SCAN = 25000              # history messages inspected per purge
+CONCURRENCY = 4               # individual deletes in flight for older messages
+PROGRESS_INTERVAL = 2.0
+
+def message_filter(authors=(), pattern=None, attachments=False):
+  author_ids = {author.id for author in authors}
+  regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+
+  def check(message):
+    return ((not author_ids or message.author.id in author_ids)
+            and (regex is None or regex.search(message.content) is not None)
+            and (not attachments or bool(message.attachments)))
+
+  return check
+
+# Walks the channel history lazily (newest first), so at most one chunk of
+# matched messages is held at a time. Recent messages are removed with bulk
+# deletes of up to BULK_SIZE; anything past the bulk delete age limit is
+# removed one by one with CONCURRENCY requests in flight. The channel only
+# needs history(), delete_messages() and messages with delete(), which keeps
+# the engine usable against a fake channel.
+
+class Purge(object):
+  def __init__(self, channel, limit, check=None, *, before=None, after=None, scan=MAX_SCAN,
+               concurrency=CONCURRENCY, progress=None, interval=PROGRESS_INTERVAL):
+    self.channel = channel
+    self.limit = limit
+    self.check = check
+    self.before = before
+    self.after = after
+    self.scan = scan
+    self.progress = progress
+    self.interval = interval
+    self._semaphore = asyncio.Semaphore(concurrency)
+    self._reported = 0.0
+
+    self.scanned = 0
+    self.matched = 0
+    self.deleted = 0
+    self.failed = 0
+
+  async def _delete(self, message):
+    async with self._semaphore:
+      try:
+        await message.delete()
+        self.deleted += 1
+
+      except HTTPException:
+        self.failed += 1
+
+  async def _singles(self, messages):
+    await asyncio.gather(*(self._delete(message) for message in messages))
+
+  async def _bulk(self, messages):
+    if len(messages) == 1:
+      return await self._singles(messages)
+
+    try:
+      await self.channel.delete_messages(messages)
+      self.deleted += len(messages)
+
+    except HTTPException:
+      # One bad message fails the whole request; retry the chunk one by one
+      # so only the messages that really cannot be deleted count as failed.
+      await self._singles(messages)
+
+  async def _report(self):
+    if self.progress is not None and monotonic() - self._reported >= self.interval:
+      self._reported = monotonic()
+      await self.progress(self)
+
+  async def run(self):
+    # A minute of slack keeps messages near the boundary out of bulk deletes.
+    cutoff = datetime.now(timezone.utc) - MAX_AGE + timedelta(minutes=1)
+    recent, old = [], []
+    self._reported = monotonic()
+
+    async for message in self.channel.history(limit=self.scan, before=self.before, after=self.after):
+      self.scanned += 1
+
+      if self.check is None or self.check(message):
+        self.matched += 1
+
+        if message.created_at > cutoff:
+          recent.append(message)
+
+          if len(recent) == BULK_SIZE:
+            await self._bulk(recent)
+            recent = []
+
+        else:
+          old.append(message)
+
+          if len(old) == BULK_SIZE:
+            await self._singles(old)
+            old = []
+
+        if self.matched >= self.limit:
+          break
+
+      await self._report()
+
+    if recent:
+      await self._bulk(recent)
+
+    if old:
+      await self._singles(old)
+
+    return self
@@ -0,0 +1,144 @@
+from bisect import bisect_left, insort
+
+# Members ordered by XP (descending, ties by UserID) with O(log n) rank lookups.
+# Keys live in sorted buckets of roughly LOAD entries, and a Fenwick tree over
+# the bucket sizes turns a bucket position into an overall rank. Slicing the
+# index returns (UserID, XP, Level) rows, so it can back a ListPageSource.
+
+class XPIndex(object):
+  LOAD = 512
+
+  def __init__(self):
+    self._entries = {}
+    self.build(())
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, user_id):
+    return user_id in self._entries
+
+  def __getitem__(self, item):
+    if isinstance(item, slice):
+      start, stop, _ = item.indices(len(self))
+      return self.top(stop-start, start)
+
+    if not 0 <= item < len(self):
+      raise IndexError("XPIndex index out of range")
+
+    return self.top(1, item)[0]
+
+  def build(self, rows):
+    self._entries = {user_id: (xp, level) for user_id, xp, level in rows}
+    keys = sorted((-xp, user_id) for user_id, (xp, _) in self._entries.items())
+
+    self._buckets = [keys[i:i+self.LOAD] for i in range(0, len(keys), self.LOAD)] or [[]]
+    self._maxes = [bucket[-1] if bucket else None for bucket in self._buckets]
+    self._rebuild_tree()
+
+  def get(self, user_id):
+    return self._entries.get(user_id)
+
+  def rank(self, user_id):
+    if (entry := self._entries.get(user_id)) is None:
+      return None
+
+    key = (-entry[0], user_id)
+    idx = self._locate(key)
+
+    return self._prefix(idx) + bisect_left(self._buckets[idx], key) + 1
+
+  def top(self, count, offset=0):
+    rows = []
+
+    if count <= 0 or offset >= len(self):
+      return rows
+
+    idx, pos = self._find(offset)
+
+    while idx < len(self._buckets) and len(rows) < count:
+      for neg_xp, user_id in self._buckets[idx][pos:pos+count-len(rows)]:
+        rows.append((user_id, -neg_xp, self._entries[user_id][1]))
+
+      idx, pos = idx+1, 0
+
+    return rows
+
+  def update(self, user_id, xp, level):
+    self.remove(user_id)
+    self._entries[user_id] = (xp, level)
+    self._insert((-xp, user_id))
+
+  def remove(self, user_id):
+    if (entry := self._entries.pop(user_id, None)) is None:
+      return
+
+    key = (-entry[0], user_id)
+    idx = self._locate(key)
+    bucket = self._buckets[idx]
+    del bucket[bisect_left(bucket, key)]
+
+    if not bucket and len(self._buckets) > 1:
+      del self._buckets[idx], self._maxes[idx]
+      self._rebuild_tree()
+
+    else:
+      self._maxes[idx] = bucket[-1] if bucket else None
+      self._add(idx, -1)
+
+  def _insert(self, key):
+    if self._maxes[-1] is None:
+      idx = 0
+    else:
+      idx = min(bisect_left(self._maxes, key), len(self._buckets)-1)
+
+    bucket = self._buckets[idx]
+    insort(bucket, key)
+    self._maxes[idx] = bucket[-1]
+
+    if len(bucket) > 2*self.LOAD:
+      self._buckets[idx:idx+1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+      self._maxes[idx:idx+1] = [bucket[self.LOAD-1], bucket[-1]]
+      self._rebuild_tree()
+
+    else:
+      self._add(idx, 1)
+
+  def _locate(self, key):
+    return min(bisect_left(self._maxes, key), len(self._buckets)-1)
+
+  # Fenwick tree over bucket sizes.
+
+  def _rebuild_tree(self):
+    self._tree = [0] * (len(self._buckets)+1)
+
+    for idx, bucket in enumerate(self._buckets):
+      self._add(idx, len(bucket))
+
+  def _add(self, idx, delta):
+    idx += 1
+
+    while idx < len(self._tree):
+      self._tree[idx] += delta
+      idx += idx & -idx
+
+  def _prefix(self, idx):
+    total = 0
+
+    while idx > 0:
+      total += self._tree[idx]
+      idx -= idx & -idx
+
+    return total
+
+  def _find(self, pos):
+    idx, step = 0, 1 << (len(self._tree)-1).bit_length()
+
+    while step:
+      if idx+step < len(self._tree) and self._tree[idx+step] <= pos:
+        idx += step
+        pos -= self._tree[idx]
+
+      step >>= 1
+
+    return idx, pos
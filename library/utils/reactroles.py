@@ -0,0 +1,117 @@
+import asyncio
+from traceback import print_exc
+
+from discord import HTTPException
+
+DEBOUNCE = 1.5   # seconds a member's clicks are collected before roles are edited
+
+def resolve(role_ids, choices, groups):
+  # Replays a member's clicks in order: a role in a group replaces the other
+  # roles of that group, an ungrouped role is toggled.
+  role_ids = set(role_ids)
+
+  for role_id in choices:
+    if (group := groups.get(role_id)) is not None:
+      role_ids -= group
+      role_ids.add(role_id)
+
+    else:
+      role_ids ^= {role_id}
+
+  return role_ids
+
+# Bindings are indexed as {message_id: {emoji: role_id}}, so a reaction is
+# matched with two dict lookups. Clicks are queued per member and applied
+# DEBOUNCE seconds after the last one as a single member.edit(roles=...).
+
+class ReactionRoles(object):
+  def __init__(self, delay=DEBOUNCE):
+    self.delay = delay
+    self.index = {}
+    self.groups = {}
+    self._members = {}
+    self._pending = {}
+    self._tasks = set()
+
+  def __contains__(self, message_id):
+    return message_id in self.index
+
+  def __len__(self):
+    return sum(len(emojis) for emojis in self.index.values())
+
+  def load(self, rows):
+    self.index, self._members = {}, {}
+
+    for message_id, emoji, role_id, group in rows:
+      self.bind(message_id, emoji, role_id, group)
+
+  def bind(self, message_id, emoji, role_id, group=None):
+    self.unbind(message_id, emoji)
+    self.index.setdefault(message_id, {})[emoji] = role_id
+
+    if group is not None:
+      self._members.setdefault(group, set()).add(role_id)
+
+    self._rebuild_groups()
+
+  def unbind(self, message_id, emoji):
+    if (role_id := self.index.get(message_id, {}).pop(emoji, None)) is None:
+      return None
+
+    if not self.index[message_id]:
+      del self.index[message_id]
+
+    # A role bound elsewhere keeps its group.
+    if not any(role_id in emojis.values() for emojis in self.index.values()):
+      for roles in self._members.values():
+        roles.discard(role_id)
+
+    self._rebuild_groups()
+
+    return role_id
+
+  def _rebuild_groups(self):
+    self._members = {group: roles for group, roles in self._members.items() if roles}
+    self.groups = {role_id: frozenset(roles) for roles in self._members.values() for role_id in roles}
+
+  def lookup(self, message_id, emoji):
+    return self.index.get(message_id, {}).get(emoji)
+
+  def bindings(self):
+    group_of = {role_id: group for group, roles in self._members.items() for role_id in roles}
+
+    for message_id, emojis in self.index.items():
+      for emoji, role_id in emojis.items():
+        yield message_id, emoji, role_id, group_of.get(role_id)
+
+  def select(self, member, role_id):
+    if (pending := self._pending.get(member.id)) is None:
+      pending = self._pending[member.id] = [member, [], None]
+
+    pending[1].append(role_id)
+
+    if pending[2] is not None:
+      pending[2].cancel()
+
+    pending[2] = asyncio.get_running_loop().call_later(self.delay, self._fire, member.id)
+
+  def _fire(self, member_id):
+    # The loop only holds weak references to tasks, so keep one until it ends.
+    task = asyncio.create_task(self._apply(member_id))
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+
+  async def _apply(self, member_id):
+    member, choices, _ = self._pending.pop(member_id)
+    member = member.guild.get_member(member_id) or member
+    current = {role.id for role in member.roles if not role.is_default()}
+    wanted = resolve(current, choices, self.groups)
+
+    if wanted != current:
+      roles = [role for role_id in wanted if (role := member.guild.get_role(role_id)) is not None]
+
+      try:
+        await member.edit(roles=roles, reason="Reaction role")
+
+      except HTTPException:
+        print_exc()
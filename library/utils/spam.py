@@ -0,0 +1,101 @@
+from collections import OrderedDict, deque
+from time import monotonic
+
+class Rule(object):
+  __slots__ = ("name", "limit", "window", "extract", "same", "warning", "mute")
+
+  # extract(message) returns None to ignore a message, or a (token, weight)
+  # pair. With same=True only events carrying the current token are counted,
+  # which is how duplicate content is detected.
+  def __init__(self, name, limit, window, extract, *, same=False, warning=None, mute=None):
+    self.name = name
+    self.limit = limit
+    self.window = window
+    self.extract = extract
+    self.same = same
+    self.warning = warning
+    self.mute = mute
+
+class Window(object):
+  __slots__ = ("events", "total", "counts")
+
+  def __init__(self):
+    self.events = deque()
+    self.total = 0
+    self.counts = {}
+
+  def add(self, now, token, weight):
+    self.events.append((now, token, weight))
+    self.total += weight
+    self.counts[token] = self.counts.get(token, 0) + weight
+
+  def expire(self, cutoff):
+    while self.events and self.events[0][0] < cutoff:
+      _, token, weight = self.events.popleft()
+      self.total -= weight
+
+      if (count := self.counts[token] - weight):
+        self.counts[token] = count
+      else:
+        del self.counts[token]
+
+# Per-author sliding windows, one per rule. Each check only touches the
+# author's own windows, and authors idle for longer than `idle` seconds are
+# dropped from the front of an insertion-ordered map, so both are O(1)
+# amortised regardless of how much message history the bot caches.
+
+class SpamDetector(object):
+  def __init__(self, rules, idle=600):
+    self.rules = rules
+    self.idle = idle
+    self._authors = OrderedDict()
+
+  def __len__(self):
+    return len(self._authors)
+
+  def _expire_idle(self, now):
+    while self._authors:
+      author_id, (seen, _) = next(iter(self._authors.items()))
+
+      if now - seen < self.idle:
+        break
+
+      del self._authors[author_id]
+
+  def check(self, message, now=None):
+    now = monotonic() if now is None else now
+    self._expire_idle(now)
+
+    _, windows = self._authors.pop(message.author.id, (None, {}))
+    self._authors[message.author.id] = (now, windows)
+    tripped = None
+
+    for rule in self.rules:
+      if (event := rule.extract(message)) is None:
+        continue
+
+      token, weight = event
+      window = windows.setdefault(rule.name, Window())
+      window.expire(now - rule.window)
+      window.add(now, token, weight)
+
+      if tripped is None and (window.counts[token] if rule.same else window.total) >= rule.limit:
+        tripped = rule
+        windows[rule.name] = Window()
+
+    return tripped
+
+  def forget(self, author_id):
+    self._authors.pop(author_id, None)
+
+def mentions(message):
+  return (None, 1) if message.mentions else None
+
+def messages(message):
+  return (None, 1)
+
+def content(message):
+  return (hash(message.content.casefold().strip()), 1) if message.content else None
+
+def attachments(message):
+  return (None, len(message.attachments)) if message.attachments else None
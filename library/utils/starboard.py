@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime
+from time import monotonic
+
+from discord import Embed, HTTPException, NotFound
+
+from ..db import aio
+from ..db.batch import writer
+from .cache import LRUCache
+
+EDIT_INTERVAL = 2.0   # seconds between edits of the same starboard post
+MAX_POSTS = 1000
+
+class StarPost(object):
+  __slots__ = ("source", "star_id", "stars", "dirty", "edited", "task")
+
+  def __init__(self, source, star_id, stars):
+    self.source = source
+    self.star_id = star_id
+    self.stars = stars
+    self.dirty = False
+    self.edited = 0.0
+    self.task = None
+
+# Star counts live in memory and the starboard post is refreshed at most once
+# per EDIT_INTERVAL, so a burst of reactions costs one fetch of the source
+# message and one edit per window instead of three HTTP calls per reaction.
+# Posts are edited through partial messages, which need no fetch, and the
+# absolute count is upserted through the write-behind queue on every change,
+# so an edit still pending at shutdown loses nothing but the refresh.
+
+class Starboard(object):
+  def __init__(self, bot, channel, interval=EDIT_INTERVAL, maxsize=MAX_POSTS):
+    self.bot = bot
+    self.channel = channel
+    self.interval = interval
+    self.posts = LRUCache(maxsize)
+    self._active = {}
+    self._loading = {}
+
+  async def _load(self, channel_id, message_id):
+    await writer.sync(("starboard", message_id))
+    star_id, stars = await aio.record("SELECT StarMessageID, Stars FROM starboard WHERE RootMessageID = ?",
+                                      message_id) or (None, 0)
+    source = await self.bot.get_channel(channel_id).fetch_message(message_id)
+    post = StarPost(source, star_id, stars)
+    self.posts.put(message_id, post)
+
+    return post
+
+  async def get(self, channel_id, message_id):
+    # Posts with an edit pending stay reachable even if the LRU evicted them.
+    if (post := self._active.get(message_id) or self.posts.get(message_id)) is not None:
+      return post
+
+    # Concurrent reactions on a cold message share a single load.
+    if (task := self._loading.get(message_id)) is None:
+      task = self._loading[message_id] = asyncio.ensure_future(self._load(channel_id, message_id))
+      task.add_done_callback(lambda _: self._loading.pop(message_id, None))
+
+    return await asyncio.shield(task)
+
+  async def add(self, payload):
+    post = await self.get(payload.channel_id, payload.message_id)
+    source = post.source
+
+    if source.author.bot or payload.user_id == source.author.id:
+      await source.remove_reaction(payload.emoji, payload.member)
+
+    else:
+      self.change(payload.message_id, post, 1)
+
+  async def remove(self, payload):
+    post = await self.get(payload.channel_id, payload.message_id)
+
+    # Self-stars were already taken back by add(), so their removal is ignored.
+    if post.stars and not post.source.author.bot and payload.user_id != post.source.author.id:
+      self.change(payload.message_id, post, -1)
+
+  def change(self, message_id, post, delta):
+    post.stars = max(0, post.stars + delta)
+    post.dirty = True
+    self.persist(message_id, post)
+
+    if post.task is None:
+      self._active[message_id] = post
+      post.task = asyncio.create_task(self._publish(message_id, post))
+
+  async def _publish(self, message_id, post):
+    try:
+      while post.dirty:
+        if (delay := post.edited + self.interval - monotonic()) > 0:
+          await asyncio.sleep(delay)
+
+        post.dirty = False
+
+        try:
+          await self._render(post)
+
+        except HTTPException:
+          pass
+
+        post.edited = monotonic()
+        self.persist(message_id, post)
+
+    finally:
+      post.task = None
+      self._active.pop(message_id, None)
+
+  def embed(self, post):
+    message = post.source
+    embed = Embed(title="Starred message",
+                  color=message.author.color,
+                  timestamp=datetime.utcnow())
+
+    fields = [("Author", message.author.mention, False),
+              ("Content", message.content or "See attachment", False),
+              ("Stars", post.stars, False)]
+
+    for name, value, inline in fields:
+      embed.add_field(name=name, value=value, inline=inline)
+
+    if len(message.attachments):
+      embed.set_image(url=message.attachments[0].url)
+
+    return embed
+
+  async def _render(self, post):
+    if not post.stars:
+      if post.star_id is not None:
+        star_id, post.star_id = post.star_id, None
+        await self.channel.get_partial_message(star_id).delete()
+
+    elif post.star_id is None:
+      post.star_id = (await self.channel.send(embed=self.embed(post))).id
+
+    else:
+      try:
+        await self.channel.get_partial_message(post.star_id).edit(embed=self.embed(post))
+
+      except NotFound:
+        # The starboard post was deleted by hand; put it back.
+        post.star_id = (await self.channel.send(embed=self.embed(post))).id
+
+  def persist(self, message_id, post):
+    if post.stars:
+      writer.put("INSERT INTO starboard (RootMessageID, StarMessageID, Stars) VALUES (?, ?, ?) "
+                 "ON CONFLICT(RootMessageID) DO UPDATE SET StarMessageID = excluded.StarMessageID, Stars = excluded.Stars",
+                 message_id, post.star_id, post.stars, key=("starboard", message_id))
+
+    else:
+      writer.put("DELETE FROM starboard WHERE RootMessageID = ?", message_id, key=("starboard", message_id))
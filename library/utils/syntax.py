@@ -0,0 +1,11 @@
+def syntax(command):
+  cmd_and_aliases = "|".join([str(command), *command.aliases])
+  params = []
+
+  for key, value in command.params.items():
+    if key not in ("self", "ctx"):
+      params.append(f"[{key}]" if "NoneType" in str(value) else f"<{key}>")
+
+  params = " ".join(params)
+
+  return f"```{cmd_and_aliases} {params}```"
@@ -0,0 +1,82 @@
+import asyncio
+from heapq import heapify, heappop, heappush
+from time import time
+from traceback import print_exc
+
+# One background task serves every pending expiration. Deadlines are wall
+# clock timestamps (they are persisted, so they must survive restarts) kept
+# in a heap; cancelled or rescheduled entries are skipped lazily and the heap
+# is compacted once stale entries outnumber live ones. Everything due when
+# the task wakes is handed to the callback as one batch.
+
+class ExpiryScheduler(object):
+  def __init__(self, callback):
+    self.callback = callback
+    self._heap = []
+    self._deadlines = {}
+    self._wake = asyncio.Event()
+    self._task = None
+
+  def __len__(self):
+    return len(self._deadlines)
+
+  def __contains__(self, key):
+    return key in self._deadlines
+
+  def schedule(self, key, when):
+    self._deadlines[key] = when
+    heappush(self._heap, (when, key))
+    self._compact()
+
+    if self._heap[0] == (when, key):
+      self._wake.set()
+
+  def cancel(self, key):
+    self._deadlines.pop(key, None)
+    self._compact()
+
+  def _compact(self):
+    # Cancelled and rescheduled entries stay in the heap until they surface;
+    # rebuild it once they outnumber the live ones.
+    if len(self._heap) > 64 and len(self._heap) > 2*len(self._deadlines):
+      self._heap = [(when, key) for key, when in self._deadlines.items()]
+      heapify(self._heap)
+
+  def _due(self, now):
+    due = []
+
+    while self._heap and self._heap[0][0] <= now:
+      when, key = heappop(self._heap)
+
+      if self._deadlines.get(key) == when:
+        del self._deadlines[key]
+        due.append(key)
+
+    return due
+
+  async def _run(self):
+    while True:
+      if (due := self._due(time())):
+        try:
+          await self.callback(due)
+
+        except Exception:
+          print_exc()
+
+      timeout = max(0, self._heap[0][0] - time()) if self._heap else None
+      self._wake.clear()
+
+      try:
+        await asyncio.wait_for(self._wake.wait(), timeout)
+
+      except asyncio.TimeoutError:
+        pass
+
+  def start(self):
+    if self._task is None:
+      self._task = asyncio.create_task(self._run())
+
+  def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      self._task = None
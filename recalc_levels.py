@@ -0,0 +1,16 @@
+from time import perf_counter
+
+from library.db import db
+from library.utils.levels import recalculate
+
+# Offline counterpart of the !recalclevels command: recompute every stored
+# Level from XP after changing the curve in library/utils/levels.py.
+
+start = perf_counter()
+rows = db.records("SELECT UserID, XP, Level FROM exp")
+changed = recalculate(rows)
+
+db.multi_execute("UPDATE exp SET Level = ? WHERE UserID = ? AND XP = ?", changed)
+db.commit()
+
+print(f"Recalculated {len(rows):,} members: {len(changed):,} changed level in {(perf_counter()-start)*1000:,.0f} ms.")
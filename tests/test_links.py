@@ -0,0 +1,50 @@
+from time import perf_counter
+
+from library.utils.links import LinkFilter, LinkPolicy
+
+FILTER = LinkFilter({1: LinkPolicy(forbid=True)})
+RATIO = 30              # linear scaling gives ~10 for ten times the input
+REPEATS = 5
+
+def pathological(length):
+  yield "http://" + "!" * length
+  yield "www." + "." * length
+  yield "http://x" + "(a" * (length//2)
+  yield ("a." * (length//2)) + "/"
+  yield "https://" + "a." * (length//2)
+  yield " ".join(["www.a.co/"] * (length//10))
+  yield "a " * (length//2)
+  yield ("http:// " * (length//8))
+  yield "x" * (length-1) + "/"
+
+def worst(length):
+  texts = list(pathological(length))
+  slowest = 0.0
+
+  for text in texts:
+    best = min(_timed(text) for _ in range(REPEATS))
+    slowest = max(slowest, best)
+
+  return slowest
+
+def _timed(text):
+  start = perf_counter()
+  FILTER.blocked(1, text)
+
+  return perf_counter() - start
+
+def test_link_after_many_short_words():
+  assert FILTER.blocked(1, "a "*300 + "https://evil.com") == "evil.com"
+  assert FILTER.blocked(1, "a "*1900 + "evil.com/x") == "evil.com"
+
+def test_plain_text_passes():
+  assert FILTER.blocked(1, "see you at 5.30, ok?") is None
+  assert FILTER.blocked(1, "a "*1000) is None
+
+def test_hidden_hosts():
+  assert FILTER.blocked(1, "https://ex\u200bample.com") == "example.com"
+  assert FILTER.blocked(1, "http://my_host.example.com") == "my_host.example.com"
+  assert FILTER.blocked(1, "http://localhost") == "localhost"
+
+def test_worst_case_is_bounded():
+  assert worst(4000) < RATIO * max(worst(400), 1e-5)
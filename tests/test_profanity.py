@@ -0,0 +1,25 @@
+from library.utils.profanity import ProfanityFilter, normalise
+
+FILTER = ProfanityFilter(["ass", "shit", "fuck", "bad word"])
+
+def test_punctuation_separates_words():
+  assert FILTER.contains_profanity("hello,ass")
+  assert FILTER.contains_profanity("ass-hat")
+  assert FILTER.contains_profanity("what?shit!")
+
+def test_whitespace_is_collapsed():
+  assert normalise("bad  word\t\nhere") == "bad word here"
+  assert FILTER.contains_profanity("bad  word")
+  assert FILTER.contains_profanity("bad\n\tword")
+
+def test_spelled_out_and_substituted_words():
+  assert FILTER.contains_profanity("f.u.c.k")
+  assert FILTER.contains_profanity("f u c k off")
+  assert FILTER.contains_profanity("sh1t")
+  assert FILTER.contains_profanity("@$$")
+
+def test_whole_words_only():
+  assert not FILTER.contains_profanity("class assignment")
+  assert not FILTER.contains_profanity("passage")
+  assert not FILTER.contains_profanity("bad words")
+  assert not FILTER.contains_profanity("hello there")
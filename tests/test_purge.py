@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+from library.utils.purge import BULK_SIZE, Purge, message_filter
+
+NOW = datetime.now(timezone.utc)
+
+def rejected():
+  return discord.HTTPException(SimpleNamespace(status=400, reason="Bad Request"), "rejected")
+
+class FakeMessage(object):
+  def __init__(self, channel, id, age, author=1, content="", attachments=(), fails=False):
+    self.channel = channel
+    self.id = id
+    self.created_at = NOW - age
+    self.author = SimpleNamespace(id=author)
+    self.content = content
+    self.attachments = list(attachments)
+    self.fails = fails
+
+  async def delete(self):
+    self.channel.in_flight += 1
+    self.channel.peak = max(self.channel.peak, self.channel.in_flight)
+    await asyncio.sleep(0)
+    self.channel.in_flight -= 1
+
+    if self.fails:
+      raise rejected()
+
+    self.channel.singles.append(self.id)
+
+# Holds messages newest first, like the real history iterator.
+class FakeChannel(object):
+  def __init__(self):
+    self.messages = []
+    self.bulks = []
+    self.singles = []
+    self.history_args = None
+    self.in_flight = 0
+    self.peak = 0
+
+  def add(self, count, age=timedelta(minutes=5), **kwargs):
+    for _ in range(count):
+      self.messages.append(FakeMessage(self, len(self.messages), age, **kwargs))
+
+  async def history(self, limit, before=None, after=None):
+    self.history_args = (limit, before, after)
+
+    for message in self.messages[:limit]:
+      if (before is None or message.created_at < before) and (after is None or message.created_at > after):
+        yield message
+
+  async def delete_messages(self, messages):
+    if any(message.fails for message in messages):
+      raise rejected()
+
+    self.bulks.append([message.id for message in messages])
+
+def purge(channel, limit, check=None, **kwargs):
+  return asyncio.run(Purge(channel, limit, check, **kwargs).run())
+
+def test_recent_messages_are_bulk_deleted_in_chunks():
+  channel = FakeChannel()
+  channel.add(250)
+  result = purge(channel, 250)
+
+  assert [len(chunk) for chunk in channel.bulks] == [BULK_SIZE, BULK_SIZE, 50]
+  assert channel.singles == []
+  assert result.deleted == 250
+
+def test_old_messages_are_deleted_one_by_one():
+  channel = FakeChannel()
+  channel.add(20, age=timedelta(days=15))
+  result = purge(channel, 20, concurrency=3)
+
+  assert channel.bulks == []
+  assert sorted(channel.singles) == list(range(20))
+  assert channel.peak == 3
+  assert result.deleted == 20
+
+def test_failed_bulk_delete_is_retried_one_by_one():
+  channel = FakeChannel()
+  channel.add(9)
+  channel.add(1, fails=True)
+  result = purge(channel, 10)
+
+  assert channel.bulks == []
+  assert sorted(channel.singles) == list(range(9))
+  assert (result.deleted, result.failed) == (9, 1)
+
+def test_limit_and_bounds():
+  channel = FakeChannel()
+  channel.add(10)
+  channel.add(10, age=timedelta(hours=2))
+  before, after = NOW - timedelta(hours=1), NOW - timedelta(hours=3)
+  result = purge(channel, 5, before=before, after=after, scan=500)
+
+  assert channel.history_args == (500, before, after)
+  assert channel.bulks == [[10, 11, 12, 13, 14]]
+  assert (result.matched, result.deleted) == (5, 5)
+
+def test_filters():
+  channel = FakeChannel()
+  channel.add(3, author=1, content="hello there")
+  channel.add(3, author=2, content="HELLO again")
+  channel.add(3, author=2, content="bye", attachments=["file"])
+
+  by_author = message_filter(authors=[SimpleNamespace(id=2)])
+  by_pattern = message_filter(pattern="^hello")
+  by_attachment = message_filter(attachments=True)
+
+  assert purge(channel, 100, by_author).matched == 6
+  assert purge(channel, 100, by_pattern).matched == 6
+  assert purge(channel, 100, by_attachment).matched == 3
+  assert purge(channel, 100, message_filter(authors=[SimpleNamespace(id=2)], pattern="hello")).matched == 3